@@ -1,11 +1,13 @@
 # import modules
+import sys
+
+import module_output
 from module_file import (
-    load_members_from_file,
-    save_members_to_file,
-    load_payments_from_file,
-    save_payments_to_file,
-    load_attendance_from_file,
-    save_attendance_to_file,
+    load_all_data,
+    save_changes,
+    compact_journals,
+    save_expiry_index,
+    save_revenue_rollup,
 )
 from module_input import (
     input_menu_choice,
@@ -22,11 +24,15 @@ from module_output import (
     print_payment_list,
     print_attendance_list,
     print_trainer_summary,
+    print_trainer_load,
     print_financial_summary,
+    print_monthly_revenue_breakdown,
     print_title,
     print_busiest_day_report,
     print_revenue_by_membership_type,
+    print_occupancy_report,
     print_expiry_alert,
+    print_auto_expired,
 )
 from module_process import (
     add_member,
@@ -40,12 +46,18 @@ from module_process import (
     record_payment,
     get_member_payments,
     get_payments_in_month,
+    get_monthly_revenue,
     record_attendance,
     get_member_attendance,
     get_attendance_on_date,
     get_attendance_in_range,
     get_busiest_day_of_week,
+    get_occupancy,
+    group_members_by_trainer,
+    expire_due_memberships,
+    get_trainer_load,
     get_revenue_per_membership_type,
+    seed_id_allocator,
 )
 
 # list of membership types
@@ -69,7 +81,7 @@ def member_management_menu(members, payments, attendance):
             # add new member
             data = input_member_details(MEMBERSHIP_TYPES)
             member = add_member(members, data)
-            save_members_to_file(members)
+            save_changes(members)
             print_title("Membership Confirmation (Status: PENDING)")
             print_member(member)
 
@@ -114,7 +126,7 @@ def member_management_menu(members, payments, attendance):
                     "schedule": new_schedule or None,
                 }
                 updated_member = update_member(members, member_id, updated_fields)
-                save_members_to_file(members)
+                save_changes(members)
                 print("Member updated:")
                 print_member(updated_member)
 
@@ -127,7 +139,7 @@ def member_management_menu(members, payments, attendance):
             member_id = input_non_empty("Enter Member ID to cancel: ").upper()
             cancelled = cancel_membership(members, member_id)
             if cancelled:
-                save_members_to_file(members)
+                save_changes(members)
                 print_title("Membership Cancelled")
                 print_member(cancelled)
             else:
@@ -155,8 +167,7 @@ def payment_management_menu(members, payments):
             if payment is None:
                 print("Member not found. Payment cancelled.")
             else:
-                save_payments_to_file(payments)
-                save_members_to_file(members)
+                save_changes(members, payments)
                 print_title("Payment Receipt (Status: ACTIVE)")
                 print_member(member)
                 print_payment_list([payment], "Payment Recorded")
@@ -191,7 +202,7 @@ def attendance_management_menu(members, attendance):
             else:
                 att_data = input_attendance_details()
                 record = record_attendance(attendance, member_id, att_data)
-                save_attendance_to_file(attendance)
+                save_changes(attendance_list=attendance)
                 print_title("Attendance Recorded")
                 print_attendance_list([record], "New Attendance")
 
@@ -219,8 +230,9 @@ def advanced_analytics_menu(members, payments, attendance):
         print("1. Members expiring within N days from today")
         print("2. Busiest day of the week (attendance)")
         print("3. Revenue by membership type")
-        print("4. Back to Reports menu")
-        choice = input_menu_choice("Enter choice: ", ["1", "2", "3", "4"])
+        print("4. Occupancy by 15-minute slot")
+        print("5. Back to Reports menu")
+        choice = input_menu_choice("Enter choice: ", ["1", "2", "3", "4", "5"])
 
         if choice == "1":
             # use datetime to see who is expiring soon
@@ -246,6 +258,11 @@ def advanced_analytics_menu(members, payments, attendance):
             print_revenue_by_membership_type(revenue)
 
         elif choice == "4":
+            # people in the gym per weekday / time slot (for staffing)
+            grid = get_occupancy(attendance)
+            print_occupancy_report(grid.averages(), grid.visits, grid.skipped)
+
+        elif choice == "5":
             # back to reports
             break
 
@@ -286,10 +303,18 @@ def reports_menu(members, payments, attendance):
             # monthly payment report
             year = input_non_empty("Year (YYYY): ")
             month = input_non_empty("Month (MM): ")
-            month_payments = get_payments_in_month(payments, year, month)
-            total = sum(p["amount"] for p in month_payments)
-            print_payment_list(month_payments, f"Payments for {year}-{month}")
-            print_financial_summary(total, len(month_payments))
+            # totals come from the revenue rollup, the payment list
+            # itself only if asked for
+            breakdown = get_monthly_revenue(payments, year, month)
+            count = sum(c for c, _ in breakdown.values())
+            total = sum(t for _, t in breakdown.values())
+            print_monthly_revenue_breakdown(breakdown, f"{year}-{month}")
+            print_financial_summary(total, count)
+            if count and input_menu_choice("Show the payments? (y/n): ",
+                                           ["y", "n", "Y", "N"]) in "yY":
+                month_payments = get_payments_in_month(payments, year, month)
+                print_payment_list(month_payments,
+                                   f"Payments for {year}-{month}")
 
         elif choice == "5":
             # attendance for one day
@@ -309,8 +334,9 @@ def reports_menu(members, payments, attendance):
             )
 
         elif choice == "7":
-            # trainer summary (only non-expired)
-            print_trainer_summary(members)
+            # trainer summary (only non-expired) and capacity
+            print_trainer_summary(group_members_by_trainer(members))
+            print_trainer_load(get_trainer_load(members))
 
         elif choice == "8":
             # go to advanced analytics menu
@@ -323,9 +349,18 @@ def reports_menu(members, payments, attendance):
 
 def main():
     # load existing data from files
-    members = load_members_from_file()
-    payments = load_payments_from_file()
-    attendance = load_attendance_from_file()
+    members, payments, attendance = load_all_data()
+    seed_id_allocator(members, payments, attendance)
+
+    # page long lists when someone is watching the terminal
+    if sys.stdin.isatty() and sys.stdout.isatty():
+        module_output.PAGE_SIZE = 50
+
+    # expire memberships whose end date has passed (one save for all)
+    expired = expire_due_memberships(members)
+    if expired:
+        save_changes(members)
+        print_auto_expired(expired)
 
     # show expiry alert at start (only if got members)
     DAYS_AHEAD = 7
@@ -347,11 +382,12 @@ def main():
         elif choice == "4":
             reports_menu(members, payments, attendance)
         elif choice == "5":
-            # save before exit
+            # save anything unsaved, then fold journals into the base files
             print("Exiting program. Goodbye!")
-            save_members_to_file(members)
-            save_payments_to_file(payments)
-            save_attendance_to_file(attendance)
+            save_changes(members, payments, attendance)
+            compact_journals()
+            save_expiry_index(members)
+            save_revenue_rollup(payments)
             break
 
 
@@ -0,0 +1,173 @@
+# optional NumPy analytics for the big reports
+# (module_process falls back to plain loops when numpy isn't installed)
+from datetime import date
+
+from module_store import TrackedList
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# below this many rows the plain loops are just as fast
+NUMPY_MIN_ROWS = 10000
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday",
+                 "Thursday", "Friday", "Saturday", "Sunday"]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NAT_DAYS = np.iinfo(np.int64).min if np is not None else None
+
+
+def can_use(rows, date_field):
+    # numpy path only for big loaded collections whose dates were parsed at
+    # load; a plain list can't keep the column cache, so converting it on
+    # every call would cost more than the plain loop
+    return (np is not None
+            and isinstance(rows, TrackedList)
+            and len(rows) >= NUMPY_MIN_ROWS
+            and date_field + "_ord" in rows[0])
+
+
+class Categories:
+    # string column as integer codes (codes in first-seen order)
+
+    def __init__(self):
+        self.codes_by_name = {}
+        self.names = []
+
+    def encode(self, values):
+        lookup = self.codes_by_name
+        codes = []
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.names)
+                self.names.append(value)
+            codes.append(code)
+        return np.array(codes, dtype=np.int32)
+
+
+def to_days(ordinals):
+    # date ordinals -> datetime64[D] array (None becomes NaT)
+    days = [NAT_DAYS if o is None else o - EPOCH_ORDINAL for o in ordinals]
+    return np.array(days, dtype=np.int64).view("datetime64[D]")
+
+
+class Column:
+    # one field of every row as an array, built once per collection and
+    # only extended with the rows added since (payments / attendance are
+    # append-only)
+
+    def __init__(self, convert):
+        self.convert = convert  # rows -> array
+        self.count = 0
+        self.values = None
+
+    def reset(self):
+        self.count = 0
+        self.values = self.convert([])
+
+    def update(self, rows):
+        if self.values is None or self.count > len(rows):
+            self.reset()
+        if self.count < len(rows):
+            self.values = np.concatenate(
+                [self.values, self.convert(rows[self.count:])])
+            self.count = len(rows)
+        return self.values
+
+
+class CategoryColumn(Column):
+    # string field as integer codes (names in self.categories.names)
+
+    def __init__(self, field):
+        super().__init__(
+            lambda rows: self.categories.encode(r[field] for r in rows))
+        self.categories = Categories()
+
+    def reset(self):
+        self.categories = Categories()
+        super().reset()
+
+
+def cached_column(rows, name, make_column):
+    # column kept on the collection itself, so only the columns a report
+    # needs are ever built
+    columns = getattr(rows, "columns", None)
+    if columns is None:
+        columns = rows.columns = {}
+    column = columns.get(name)
+    if column is None:
+        column = columns[name] = make_column()
+    column.update(rows)
+    return column
+
+
+def amount_column(payments):
+    return cached_column(payments, "amount", lambda: Column(
+        lambda rows: np.array([p["amount"] for p in rows], dtype=np.float64)))
+
+
+def membership_type_column(payments):
+    return cached_column(payments, "membership_type",
+                         lambda: CategoryColumn("membership_type"))
+
+
+def date_column(rows, date_field):
+    return cached_column(rows, date_field, lambda: Column(
+        lambda new_rows: to_days(r[date_field + "_ord"] for r in new_rows)))
+
+
+# REPORTS (same results as the module_process versions)
+
+def revenue_per_membership_type(payments):
+    # group-by sum with bincount
+    types = membership_type_column(payments)
+    names = types.categories.names
+    totals = np.bincount(types.values, weights=amount_column(payments).values,
+                         minlength=len(names))
+    return {name: float(totals[code]) for code, name in enumerate(names)}
+
+
+def in_month(date_str, year, month):
+    # same test as the plain loop in module_process.get_payments_in_month
+    parts = date_str.split("-")
+    return len(parts) == 3 and parts[0] == year and parts[1] == month
+
+
+def payments_in_month(payments, year, month):
+    # payments whose date_paid is in year-month (strings like "2025", "09")
+    # numpy narrows it down to rows dated in that month plus rows whose
+    # date didn't parse (NaT); those are then checked against the date
+    # string like the loop does, so both paths return the same rows
+    target = None
+    if (len(year) == 4 and len(month) == 2
+            and year.isdigit() and month.isdigit()):
+        try:
+            target = np.datetime64(f"{year}-{month}", "M")
+        except ValueError:  # e.g. month "13"
+            pass
+    if target is None:
+        # "3" instead of "03" etc: only the string test can match
+        return [p for p in payments if in_month(p["date_paid"], year, month)]
+    dates = date_column(payments, "date_paid").values
+    mask = (dates.astype("datetime64[M]") == target) | np.isnat(dates)
+    return [payments[i] for i in np.flatnonzero(mask)
+            if in_month(payments[i]["date_paid"], year, month)]
+
+
+def busiest_day_of_week(attendance_list):
+    # visits per weekday with bincount (1970-01-01 was a Thursday)
+    dates = date_column(attendance_list, "date").values
+    valid = ~np.isnat(dates)
+    weekdays = (dates[valid].astype(np.int64) + 3) % 7
+    if weekdays.size == 0:
+        return None, {}
+    counts = np.bincount(weekdays, minlength=7)
+    # dict in first-seen order, like the Counter version
+    first_seen = sorted((int(np.argmax(weekdays == w)), w)
+                        for w in range(7) if counts[w])
+    stats = {WEEKDAY_NAMES[w]: int(counts[w]) for _, w in first_seen}
+    busiest = max(stats, key=stats.get)  # ties: first seen, like Counter
+    return busiest, stats
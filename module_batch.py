@@ -0,0 +1,161 @@
+# batch import of turnstile check-ins / POS payments from CSV exports
+#
+# run: python module_batch.py attendance turnstile.csv
+#      python module_batch.py payments pos_export.csv
+#
+# attendance CSV columns: member_id,date,checkin,checkout
+# payments CSV columns  : member_id,date_paid,amount,method,membership_type
+import csv
+import sys
+import time
+
+from module_file import load_all_data, save_changes
+from module_output import print_import_summary
+from module_process import (
+    ID_ALLOCATOR,
+    clean_amount,
+    clean_date,
+    clean_text,
+    clean_time,
+    find_member,
+    record_attendance,
+    record_payment,
+    seed_id_allocator,
+)
+
+ATTENDANCE_CSV_COLUMNS = ["member_id", "date", "checkin", "checkout"]
+PAYMENT_CSV_COLUMNS = ["member_id", "date_paid", "amount", "method",
+                       "membership_type"]
+
+
+def read_csv_rows(path, columns):
+    # rows as dicts (header line required), with line numbers for errors
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+        for line_no, row in enumerate(reader, start=2):
+            yield line_no, {c: (row[c] or "").strip() for c in columns}
+
+
+def validate_attendance_row(members, row):
+    # error message, or None if the row is fine (same date / time checks
+    # as the server, so the rows sort and compare like all the others)
+    if find_member(members, row["member_id"].upper()) is None:
+        return f"unknown member {row['member_id']}"
+    try:
+        clean_date(row["date"], "date")
+        clean_time(row["checkin"], "checkin")
+        clean_time(row["checkout"], "checkout")
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def validate_payment_row(members, row):
+    # error message, or None if the row is fine (amount converted to float)
+    if find_member(members, row["member_id"].upper()) is None:
+        return f"unknown member {row['member_id']}"
+    # YYYY-MM-DD date, finite positive amount; no commas in text (they'd
+    # split the line)
+    try:
+        clean_date(row["date_paid"], "date_paid")
+        row["amount"] = clean_amount(row["amount"])
+        row["method"] = clean_text(row["method"], "method")
+        row["membership_type"] = clean_text(row["membership_type"],
+                                            "membership type")
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def make_summary(imported, rejected, started):
+    seconds = time.perf_counter() - started
+    total = imported + len(rejected)
+    return {
+        "imported": imported,
+        "rejected": rejected,
+        "seconds": seconds,
+        "rows_per_second": total / seconds if seconds > 0 else 0.0,
+    }
+
+
+def import_attendance_rows(rows, members, attendance_list, save=True):
+    # validate all rows against the member index, record the good ones,
+    # then persist once; rows = iterable of (line_no, row dict)
+    started = time.perf_counter()
+    if not ID_ALLOCATOR.is_seeded("A"):
+        ID_ALLOCATOR.seed("A", attendance_list, "attendance_id")
+
+    valid = []
+    rejected = []
+    for line_no, row in rows:
+        error = validate_attendance_row(members, row)
+        if error:
+            rejected.append((line_no, error))
+        else:
+            valid.append(row)
+
+    for row in valid:
+        record_attendance(attendance_list, row["member_id"].upper(), row)
+
+    if save and valid:
+        save_changes(attendance_list=attendance_list)
+    return make_summary(len(valid), rejected, started)
+
+
+def import_payment_rows(rows, members, payments, save=True):
+    # same as import_attendance_rows for payments; paid members become active
+    started = time.perf_counter()
+    if not ID_ALLOCATOR.is_seeded("P"):
+        ID_ALLOCATOR.seed("P", payments, "payment_id")
+
+    valid = []
+    rejected = []
+    for line_no, row in rows:
+        error = validate_payment_row(members, row)
+        if error:
+            rejected.append((line_no, error))
+        else:
+            valid.append(row)
+
+    for row in valid:
+        record_payment(members, payments, row["member_id"].upper(), row)
+
+    if save and valid:
+        save_changes(members, payments)
+    return make_summary(len(valid), rejected, started)
+
+
+def import_attendance_csv(path, members, attendance_list):
+    rows = read_csv_rows(path, ATTENDANCE_CSV_COLUMNS)
+    return import_attendance_rows(rows, members, attendance_list)
+
+
+def import_payments_csv(path, members, payments):
+    rows = read_csv_rows(path, PAYMENT_CSV_COLUMNS)
+    return import_payment_rows(rows, members, payments)
+
+
+def main(args):
+    if len(args) != 2 or args[0] not in ("attendance", "payments"):
+        print("Usage: python module_batch.py attendance|payments FILE.csv")
+        return 1
+    kind, path = args
+    members, payments, attendance = load_all_data()
+    seed_id_allocator(members, payments, attendance)
+    try:
+        if kind == "attendance":
+            summary = import_attendance_csv(path, members, attendance)
+        else:
+            summary = import_payments_csv(path, members, payments)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    print_import_summary(kind, summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,585 @@
+# benchmark helpers
+#
+# run: python module_benchmark.py             (lookup / memory / server / threads)
+#      python module_benchmark.py suite [ROWS ...] [--out FILE.json]
+#                                             (load / save / report suite on
+#                                              synthetic data, default 10k 100k 1M)
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import module_file
+from module_server import GymClient, GymServer
+from module_service import GymService
+from module_store import AttendanceList, MemberStore, PaymentList
+from module_process import (
+    add_member,
+    find_member,
+    set_date_ordinals,
+    seed_id_allocator,
+    ATTENDANCE_DATE_FIELDS,
+    MEMBERSHIP_DAYS,
+    get_active_members,
+    get_expired_members,
+    get_pending_members,
+    get_members_expiring_within_days,
+    get_member_payments,
+    get_payments_in_month,
+    get_monthly_revenue,
+    get_revenue_per_membership_type,
+    get_member_attendance,
+    get_attendance_on_date,
+    get_attendance_in_range,
+    get_busiest_day_of_week,
+    get_occupancy,
+    group_members_by_trainer,
+    get_trainer_load,
+    record_attendance,
+    record_payment,
+)
+from module_analytics import np
+from module_records import Attendance
+
+
+def make_members(count):
+    # fake members for benchmarking
+    trainers = ["Trainer Alex", "Trainer Bella", "Trainer Chris"]
+    statuses = ["active", "expired", "pending"]
+    members = []
+    for i in range(1, count + 1):
+        members.append({
+            "member_id": f"M{i:03d}",
+            "name": f"Member {i}",
+            "age": 20 + i % 50,
+            "phone": f"01{i:08d}",
+            "membership_type": "Monthly",
+            "start_date": "2025-01-01",
+            "end_date": "2025-12-31",
+            "status": statuses[i % 3],
+            "trainer": trainers[i % 3],
+            "schedule": "MonWedFri 18-20",
+        })
+    return members
+
+
+def time_lookups(members, member_ids):
+    # average seconds per find_member call
+    start = time.perf_counter()
+    for member_id in member_ids:
+        find_member(members, member_id)
+    return (time.perf_counter() - start) / len(member_ids)
+
+
+def benchmark_member_lookup(sizes=(1000, 10000, 100000), lookups=200, seed=1):
+    # compare plain list scan vs MemberStore index
+    rng = random.Random(seed)
+    print(f"{'members':>10} {'list (us)':>12} {'store (us)':>12}")
+    results = []
+    for size in sizes:
+        members = make_members(size)
+        store = MemberStore(members)
+        member_ids = [f"M{rng.randint(1, size):03d}" for _ in range(lookups)]
+        list_time = time_lookups(members, member_ids) * 1e6
+        store_time = time_lookups(store, member_ids) * 1e6
+        print(f"{size:>10} {list_time:>12.2f} {store_time:>12.2f}")
+        results.append((size, list_time, store_time))
+    return results
+
+
+def make_attendance_row(i):
+    # fake attendance dict (same shape as the loader output)
+    row = {
+        "attendance_id": f"A{i:03d}",
+        "member_id": f"M{i % 5000:03d}",
+        "date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+        "checkin": "18:00",
+        "checkout": "19:30",
+    }
+    set_date_ordinals(row, ATTENDANCE_DATE_FIELDS)
+    return row
+
+
+def measure_memory(build):
+    # bytes still allocated after build() (the rows it keeps)
+    tracemalloc.start()
+    rows = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(rows)
+
+
+def benchmark_record_memory(count=1_000_000):
+    # dict rows vs slotted Attendance records
+    dict_bytes, _ = measure_memory(
+        lambda: [make_attendance_row(i) for i in range(count)])
+    slot_bytes, _ = measure_memory(
+        lambda: [Attendance.from_dict(make_attendance_row(i))
+                 for i in range(count)])
+    print(f"{'rows':>10} {'dict (MB)':>12} {'slots (MB)':>12} "
+          f"{'bytes/row':>20}")
+    print(f"{count:>10} {dict_bytes / 1e6:>12.1f} {slot_bytes / 1e6:>12.1f} "
+          f"{dict_bytes // count:>9} -> {slot_bytes // count:<8}")
+    return dict_bytes, slot_bytes
+
+
+async def run_server_load(clients, requests_per_client, member_count):
+    # server on a free port, clients mixing reads and writes
+    members, payments, attendance = module_file.load_all_data()
+    members.extend(make_members(member_count))
+    seed_id_allocator(members, payments, attendance)
+    gym = GymServer(members, payments, attendance)
+    server = await gym.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def client(seed):
+        rng = random.Random(seed)
+        conn = await GymClient.connect(port=port)
+        for i in range(requests_per_client):
+            member_id = f"M{rng.randint(1, member_count):03d}"
+            if i % 4 == 0:
+                await conn.call("record_attendance", member_id=member_id,
+                                attendance_data={"date": "2025-10-01",
+                                                 "checkin": "18:00",
+                                                 "checkout": "19:00"})
+            elif i % 4 == 1:
+                await conn.call("record_payment", member_id=member_id,
+                                payment_data={"date_paid": "2025-10-01",
+                                              "amount": 150.0,
+                                              "method": "Card",
+                                              "membership_type": "Monthly"})
+            elif i % 4 == 2:
+                await conn.call("find_member", member_id=member_id)
+            else:
+                await conn.call("member_payments", member_id=member_id)
+        await conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    seconds = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    return seconds
+
+
+def benchmark_server(clients=8, requests_per_client=500, member_count=1000):
+    # requests per second against a server using a temp data folder
+    old_folder = module_file.DATA_FOLDER
+    with tempfile.TemporaryDirectory() as folder:
+        module_file.set_data_folder(folder)
+        try:
+            seconds = asyncio.run(
+                run_server_load(clients, requests_per_client, member_count))
+        finally:
+            module_file.set_data_folder(old_folder)
+    total = clients * requests_per_client
+    print(f"{'clients':>10} {'requests':>10} {'seconds':>10} {'req/s':>10}")
+    print(f"{clients:>10} {total:>10} {seconds:>10.2f} {total / seconds:>10.0f}")
+    return total / seconds
+
+
+def stress_service(threads=16, ops_per_thread=500, member_count=200, seed=1,
+                   persist=False):
+    # many threads adding members / payments / visits at once, then check
+    # that no ID was handed out twice and nothing got lost
+    # (persist=True saves every change to a temp data folder and checks
+    # the reloaded files too - much slower, so use fewer ops)
+    if not persist:
+        service = GymService(MemberStore(make_members(member_count)),
+                             PaymentList(), AttendanceList(), persist=False)
+        return run_stress(service, threads, ops_per_thread, member_count,
+                          seed)
+    old_folder = module_file.DATA_FOLDER
+    with tempfile.TemporaryDirectory() as folder:
+        module_file.set_data_folder(folder)
+        try:
+            module_file.save_members_to_file(make_members(member_count))
+            service = GymService(*module_file.load_all_data(), persist=True)
+            return run_stress(service, threads, ops_per_thread, member_count,
+                              seed, reload=True)
+        finally:
+            module_file.set_data_folder(old_folder)
+
+
+def run_stress(service, threads, ops_per_thread, member_count, seed,
+               reload=False):
+    def worker(n):
+        rng = random.Random(seed + n)
+        counts = {"M": 0, "P": 0, "A": 0}
+        for i in range(ops_per_thread):
+            member_id = f"M{rng.randint(1, member_count):03d}"
+            if i % 10 == 0:
+                service.add_member({"name": f"Stress {n}-{i}", "age": 30,
+                                    "phone": "0100000000",
+                                    "membership_type": "Monthly",
+                                    "start_date": "2025-10-01",
+                                    "end_date": "2025-10-31",
+                                    "trainer": "Trainer Alex",
+                                    "schedule": "MonWedFri 18-20"})
+                counts["M"] += 1
+            elif i % 2 == 0:
+                service.record_payment(member_id, {
+                    "date_paid": "2025-10-01", "amount": 150.0,
+                    "method": "Card", "membership_type": "Monthly"})
+                counts["P"] += 1
+            else:
+                service.record_attendance(member_id, {
+                    "date": "2025-10-01", "checkin": "18:00",
+                    "checkout": "19:00"})
+                counts["A"] += 1
+            if i % 7 == 0:
+                service.get_member_payments(member_id)
+        return counts
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    seconds = time.perf_counter() - start
+
+    expected = {key: sum(r[key] for r in results) for key in "MPA"}
+    problems = check_stress_rows("", service.members, service.payments,
+                                 service.attendance, expected, member_count)
+    if reload:
+        # what a restart would see: every change made it to disk once
+        problems.extend(check_stress_rows(
+            "saved ", *module_file.load_all_data(), expected, member_count))
+
+    total = threads * ops_per_thread
+    mode = "saved" if reload else "memory"
+    print(f"{'threads':>10} {'ops':>10} {'seconds':>10} {'ops/s':>10} "
+          f"{'mode':>8}")
+    print(f"{threads:>10} {total:>10} {seconds:>10.2f} "
+          f"{total / seconds:>10.0f} {mode:>8}")
+    print("stress check: " + ("OK" if not problems else "; ".join(problems)))
+    return problems
+
+
+def check_stress_rows(label, members, payments, attendance, expected,
+                      member_count):
+    # row counts, duplicate IDs and the payments index after a stress run
+    checks = [
+        ("members", members, "member_id", member_count + expected["M"]),
+        ("payments", payments, "payment_id", expected["P"]),
+        ("attendance", attendance, "attendance_id", expected["A"]),
+    ]
+    problems = []
+    for name, rows, id_field, count in checks:
+        ids = [row[id_field] for row in rows]
+        if len(ids) != count:
+            problems.append(f"{label}{name}: {len(ids)} rows, "
+                            f"expected {count}")
+        if len(set(ids)) != len(ids):
+            problems.append(f"{label}{name}: "
+                            f"{len(ids) - len(set(ids))} duplicate IDs")
+    by_member = getattr(payments, "by_member", None)  # not in sqlite
+    indexed = sum(len(v) for v in (by_member or {}).values())
+    if by_member is not None and indexed != len(payments):
+        problems.append(f"{label}payments index: {indexed} of "
+                        f"{len(payments)}")
+    return problems
+
+
+# SYNTHETIC DATA
+# one "size" = that many attendance rows, plus size // 4 payments and
+# size // 20 members (roughly what a real gym's files look like)
+
+FIRST_NAMES = ["Joel", "Amira", "Daniel", "Siti", "Marcus", "Nur", "Henry",
+               "Kimberley", "Aisha", "Wei", "Priya", "Omar", "Lina", "Ravi"]
+LAST_NAMES = ["Kho", "Tan", "Lee", "Rahman", "Wong", "Aisyah", "Chan",
+              "Anne", "Lim", "Kumar", "Ong", "Ismail", "Ng", "Teo"]
+TRAINERS = [f"Trainer {name}" for name in
+            ["Alex", "Bella", "Chris", "Dana", "Evan", "Farah", "Gus", "Hana"]]
+SCHEDULES = ["MonWedFri 18-20", "TueThu 19-21", "SatSun 10-12",
+             "MonWed 7-9", "Weekdays 18-20", "TueThuSat 8-10", "MonWedFri 6-8"]
+# (membership type, days, price); the days come from module_process
+PLANS = [(mtype, MEMBERSHIP_DAYS[mtype], price) for mtype, price in
+         [("Monthly", 150.0), ("Quarterly", 400.0), ("Yearly", 1200.0)]]
+METHODS = ["Cash", "Card", "Online"]
+FIRST_DAY = date(2024, 1, 1)
+DAYS_SPAN = 730
+
+
+def synthetic_members(count, rng):
+    for i in range(1, count + 1):
+        mtype, length, _ = rng.choice(PLANS)
+        start = FIRST_DAY + timedelta(days=rng.randrange(DAYS_SPAN))
+        yield {
+            "member_id": f"M{i:03d}",
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "age": rng.randint(16, 70),
+            "phone": f"01{rng.randrange(10 ** 8):08d}",
+            "membership_type": mtype,
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=length)).isoformat(),
+            "status": rng.choices(["active", "expired", "pending"],
+                                  [6, 3, 1])[0],
+            "trainer": rng.choice(TRAINERS),
+            "schedule": rng.choice(SCHEDULES),
+        }
+
+
+def synthetic_payments(count, member_count, rng):
+    for i in range(1, count + 1):
+        mtype, _, price = rng.choice(PLANS)
+        paid = FIRST_DAY + timedelta(days=rng.randrange(DAYS_SPAN))
+        yield {
+            "payment_id": f"P{i:03d}",
+            "member_id": f"M{rng.randint(1, member_count):03d}",
+            "date_paid": paid.isoformat(),
+            "amount": price,
+            "method": rng.choice(METHODS),
+            "membership_type": mtype,
+        }
+
+
+def synthetic_attendance(count, member_count, rng):
+    # busy mornings and evenings, 45 min - 2 h visits, the odd late night
+    # one going past midnight
+    for i in range(1, count + 1):
+        day = FIRST_DAY + timedelta(days=rng.randrange(DAYS_SPAN))
+        hour = rng.choices([6, 7, 8, 10, 12, 17, 18, 19, 20, 23],
+                           [8, 10, 6, 3, 4, 8, 12, 10, 5, 1])[0]
+        checkin = hour * 60 + rng.randrange(60)
+        checkout = (checkin + rng.randint(45, 120)) % (24 * 60)
+        yield {
+            "attendance_id": f"A{i:03d}",
+            "member_id": f"M{rng.randint(1, member_count):03d}",
+            "date": day.isoformat(),
+            "checkin": f"{checkin // 60:02d}:{checkin % 60:02d}",
+            "checkout": f"{checkout // 60:02d}:{checkout % 60:02d}",
+        }
+
+
+def write_rows(path, rows, to_line):
+    # stream rows to a data file (nothing kept in memory)
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(to_line(row) + "\n")
+
+
+def generate_dataset(folder, size, seed=1):
+    # members.txt / payments.txt / attendance.txt for one size, same
+    # format as data/ (same seed = same files)
+    rng = random.Random(seed)
+    member_count = max(size // 20, 1)
+    os.makedirs(folder, exist_ok=True)
+    write_rows(os.path.join(folder, "members.txt"),
+               synthetic_members(member_count, rng), module_file.member_to_line)
+    write_rows(os.path.join(folder, "payments.txt"),
+               synthetic_payments(size // 4, member_count, rng),
+               module_file.payment_to_line)
+    write_rows(os.path.join(folder, "attendance.txt"),
+               synthetic_attendance(size, member_count, rng),
+               module_file.attendance_to_line)
+    return member_count
+
+
+# SUITE
+
+def measure(fn, calls=1, trace_memory=True, repeat=True):
+    # seconds per call (untraced run), then peak bytes of one traced call
+    # repeat=False is for writes: the traced call is one of the `calls`
+    # (no extra rows), so with calls=1 the timed call is the traced one
+    untraced = calls if repeat or not trace_memory else calls - 1
+    seconds = None
+    result = None
+    if untraced:
+        start = time.perf_counter()
+        for _ in range(untraced):
+            result = fn()
+        seconds = (time.perf_counter() - start) / untraced
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        traced_seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if seconds is None:
+            seconds = traced_seconds
+    return seconds, peak, result
+
+
+# cases that change the data (run exactly `calls` times, see measure)
+WRITE_CASES = {"add_member", "record_payment", "record_attendance",
+               "save_changes", "compact_journals"}
+
+
+def suite_cases(member_count, rng):
+    # (name, calls, function taking the loaded data) - load / save runs
+    # first, then streaming / on-disk reads, every get_* query / report,
+    # the write operations and finally the saved indexes
+    def member_id():
+        return f"M{rng.randint(1, member_count):03d}"
+
+    def attendance_id(d):
+        return f"A{rng.randint(1, len(d[2])):03d}"
+
+    new_member = {"name": "Bench Member", "age": 30, "phone": "0100000000",
+                  "membership_type": "Monthly", "start_date": "2025-10-01",
+                  "end_date": "2025-10-31", "trainer": "Trainer Alex",
+                  "schedule": "MonWedFri 18-20"}
+    payment = {"date_paid": "2025-10-01", "amount": 150.0, "method": "Card",
+               "membership_type": "Monthly"}
+    visit = {"date": "2025-10-01", "checkin": "18:00", "checkout": "19:30"}
+
+    return [
+        ("load_members_from_file", 1,
+         lambda d: module_file.load_members_from_file()),
+        ("load_payments_from_file", 1,
+         lambda d: module_file.load_payments_from_file()),
+        ("load_attendance_from_file", 1,
+         lambda d: module_file.load_attendance_from_file()),
+        ("load_all_data", 1, lambda d: module_file.load_all_data()),
+        ("save_members_to_file", 1,
+         lambda d: module_file.save_members_to_file(d[0])),
+        ("save_payments_to_file", 1,
+         lambda d: module_file.save_payments_to_file(d[1])),
+        ("save_attendance_to_file", 1,
+         lambda d: module_file.save_attendance_to_file(d[2])),
+        ("iter_members_from_file", 1,
+         lambda d: sum(1 for _ in module_file.iter_members_from_file())),
+        ("iter_payments_from_file", 1,
+         lambda d: sum(1 for _ in module_file.iter_payments_from_file())),
+        ("iter_attendance_from_file", 1,
+         lambda d: sum(1 for _ in module_file.iter_attendance_from_file())),
+        ("read_attendance_record", 1000,
+         lambda d: module_file.read_attendance_record(attendance_id(d))),
+        ("read_attendance_on_date", 1000,
+         lambda d: module_file.read_attendance_on_date("2025-03-14")),
+        ("read_attendance_in_range", 100,
+         lambda d: module_file.read_attendance_in_range("2025-03-10",
+                                                        "2025-03-16")),
+        ("get_active_members", 5, lambda d: get_active_members(d[0])),
+        ("get_expired_members", 5, lambda d: get_expired_members(d[0])),
+        ("get_pending_members", 5, lambda d: get_pending_members(d[0])),
+        ("get_members_expiring_within_days", 5,
+         lambda d: get_members_expiring_within_days(d[0], 30)),
+        ("find_member", 1000, lambda d: find_member(d[0], member_id())),
+        ("get_member_payments", 1000,
+         lambda d: get_member_payments(d[1], member_id())),
+        ("get_payments_in_month", 5,
+         lambda d: get_payments_in_month(d[1], "2025", "03")),
+        ("get_monthly_revenue", 1000,
+         lambda d: get_monthly_revenue(d[1], "2025", "03")),
+        ("get_revenue_per_membership_type", 5,
+         lambda d: get_revenue_per_membership_type(d[1])),
+        ("get_member_attendance", 1000,
+         lambda d: get_member_attendance(d[2], member_id())),
+        ("get_attendance_on_date", 1000,
+         lambda d: get_attendance_on_date(d[2], "2025-03-14")),
+        ("get_attendance_in_range", 100,
+         lambda d: get_attendance_in_range(d[2], "2025-03-10", "2025-03-16")),
+        ("get_busiest_day_of_week", 1,
+         lambda d: get_busiest_day_of_week(d[2])),
+        # plain list copy, so the grid is built every time (an
+        # AttendanceList would hand back its cached one)
+        ("get_occupancy", 1, lambda d: get_occupancy(list(d[2])).averages()),
+        ("group_members_by_trainer", 5,
+         lambda d: group_members_by_trainer(d[0])),
+        ("get_trainer_load", 5, lambda d: get_trainer_load(d[0])),
+        ("add_member", 1000, lambda d: add_member(d[0], new_member)),
+        ("record_payment", 1000,
+         lambda d: record_payment(d[0], d[1], member_id(), payment)),
+        ("record_attendance", 1000,
+         lambda d: record_attendance(d[2], member_id(), visit)),
+        ("save_changes", 1,
+         lambda d: module_file.save_changes(d[0], d[1], d[2])),
+        ("compact_journals", 1, lambda d: module_file.compact_journals()),
+        ("save_expiry_index", 1,
+         lambda d: module_file.save_expiry_index(d[0])),
+        ("load_expiry_index", 1, lambda d: module_file.load_expiry_index()),
+        ("save_revenue_rollup", 1,
+         lambda d: module_file.save_revenue_rollup(d[1])),
+        ("load_revenue_rollup", 1,
+         lambda d: module_file.load_revenue_rollup()),
+    ]
+
+
+def run_size(size, seed, trace_memory):
+    # generate one data set in a temp folder and run every case on it
+    results = []
+    old_folder = module_file.DATA_FOLDER
+    with tempfile.TemporaryDirectory() as folder:
+        member_count = generate_dataset(folder, size, seed)
+        module_file.set_data_folder(folder)
+        try:
+            data = module_file.load_all_data()
+            seed_id_allocator(*data)
+            rng = random.Random(seed)
+            for name, calls, fn in suite_cases(member_count, rng):
+                repeat = name not in WRITE_CASES
+                seconds, peak, _ = measure(lambda: fn(data), calls,
+                                           trace_memory, repeat)
+                results.append({"size": size, "case": name, "calls": calls,
+                                "seconds": seconds, "peak_bytes": peak,
+                                "timed_under_trace": (trace_memory
+                                                      and not repeat
+                                                      and calls == 1)})
+                peak_mb = f"{peak / 1e6:10.1f}" if peak is not None else \
+                    f"{'-':>10}"
+                print(f"{size:>9} {name:34} {seconds * 1e3:12.3f} {peak_mb}")
+        finally:
+            module_file.set_data_folder(old_folder)
+    return results
+
+
+def run_suite(sizes=(10_000, 100_000, 1_000_000), seed=1,
+              out="bench_results.json", trace_memory=True):
+    # full suite; results also written as JSON (compare runs between
+    # releases by size + case)
+    print(f"{'size':>9} {'case':34} {'ms/call':>12} {'peak MB':>10}")
+    results = []
+    for size in sizes:
+        results.extend(run_size(size, seed, trace_memory))
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__ if np is not None else None,
+        "storage_backend": module_file.STORAGE_BACKEND,
+        "seed": seed,
+        "results": results,
+    }
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {out}")
+    return report
+
+
+def main(args):
+    if args and args[0] == "suite":
+        out = "bench_results.json"
+        sizes = []
+        rest = args[1:]
+        while rest:
+            arg = rest.pop(0)
+            if arg == "--out" and rest:
+                out = rest.pop(0)
+            elif arg.isdigit():
+                sizes.append(int(arg))
+            else:
+                print("Usage: python module_benchmark.py suite [ROWS ...] "
+                      "[--out FILE.json]")
+                return 1
+        run_suite(tuple(sizes) or (10_000, 100_000, 1_000_000), out=out)
+        return 0
+    benchmark_member_lookup()
+    benchmark_record_memory()
+    benchmark_server()
+    stress_service()
+    stress_service(threads=8, ops_per_thread=50, persist=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
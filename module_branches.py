@@ -0,0 +1,107 @@
+# reports for several branches at once (one data folder per branch)
+#
+# run: python module_branches.py YYYY MM data_branch1 data_branch2 ...
+#
+# each branch is loaded and reported in its own process, then the
+# per-branch numbers are added up into chain-wide totals
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import module_file
+from module_output import print_branch_report
+from module_process import (
+    WEEKDAY_NAMES,
+    get_busiest_day_of_week,
+    get_monthly_revenue,
+    get_revenue_per_membership_type,
+)
+from module_store import PaymentList
+
+
+def branch_report(folder, year, month):
+    # runs in a worker process: load one branch and compute its reports
+    # (only plain dicts / numbers go back to the parent process)
+    old_folder = module_file.DATA_FOLDER
+    module_file.set_data_folder(folder)
+    try:
+        payments = PaymentList(module_file.load_payments_from_file(),
+                               module_file.load_revenue_rollup())
+        attendance = module_file.load_attendance_from_file()
+    finally:
+        # the single-branch case runs in the caller's process
+        module_file.set_data_folder(old_folder)
+
+    busiest_day, visits = get_busiest_day_of_week(attendance)
+    month_revenue = get_monthly_revenue(payments, year, month).values()
+    return {
+        "branch": folder,
+        "revenue": get_revenue_per_membership_type(payments),
+        "busiest_day": busiest_day,
+        "visits": visits,
+        "month_total": sum(total for _, total in month_revenue),
+        "month_count": sum(count for count, _ in month_revenue),
+    }
+
+
+def merge_branch_reports(reports):
+    # chain-wide totals from the per-branch reports
+    revenue = {}
+    visits = {}
+    month_total = 0.0
+    month_count = 0
+    for report in reports:
+        for mtype, total in report["revenue"].items():
+            revenue[mtype] = revenue.get(mtype, 0.0) + total
+        for day, count in report["visits"].items():
+            visits[day] = visits.get(day, 0) + count
+        month_total += report["month_total"]
+        month_count += report["month_count"]
+
+    # weekday order so ties go to the earlier day
+    visits = {day: visits[day] for day in WEEKDAY_NAMES if day in visits}
+    busiest_day = max(visits, key=visits.get) if visits else None
+    return {
+        "branch": "All branches",
+        "revenue": revenue,
+        "busiest_day": busiest_day,
+        "visits": visits,
+        "month_total": month_total,
+        "month_count": month_count,
+    }
+
+
+def run_branch_reports(folders, year, month, workers=None):
+    # per-branch reports in parallel (same order as folders) + totals
+    # (a mistyped folder is an error, not a branch with no data)
+    for folder in folders:
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(f"branch data folder not found: {folder}")
+    if len(folders) == 1:
+        reports = [branch_report(folders[0], year, month)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = list(pool.map(branch_report, folders,
+                                    [year] * len(folders),
+                                    [month] * len(folders)))
+    return reports, merge_branch_reports(reports)
+
+
+def main(args):
+    if len(args) < 3:
+        print("Usage: python module_branches.py YYYY MM FOLDER [FOLDER ...]")
+        return 1
+    year, month, folders = args[0], args[1], args[2:]
+    try:
+        reports, totals = run_branch_reports(folders, year, month)
+    except OSError as e:
+        print(f"Report failed: {e}")
+        return 1
+    for report in reports:
+        print_branch_report(report, year, month)
+    print_branch_report(totals, year, month)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,11 +1,90 @@
 # file handling module
+import mmap
 import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 
-# file paths
+import module_snapshot
+import module_sqlite
+from module_records import Member, Payment, Attendance
+from module_process import (
+    iter_date_ordinals,
+    set_date_ordinals,
+    date_to_ordinal,
+    id_number,
+    MEMBER_DATE_FIELDS,
+    PAYMENT_DATE_FIELDS,
+    ATTENDANCE_DATE_FIELDS,
+)
+from module_store import (
+    MemberStore,
+    TrackedList,
+    PaymentList,
+    AttendanceList,
+    ExpiryIndex,
+    RevenueRollup,
+)
+
+try:
+    import fcntl
+except ImportError:  # windows has no flock, saves are still atomic
+    fcntl = None
+
+# file paths (set_data_folder below points them somewhere else)
 DATA_FOLDER = "data"
 MEMBERS_FILE = os.path.join(DATA_FOLDER, "members.txt")
 PAYMENTS_FILE = os.path.join(DATA_FOLDER, "payments.txt")
 ATTENDANCE_FILE = os.path.join(DATA_FOLDER, "attendance.txt")
+MEMBERS_JOURNAL = os.path.join(DATA_FOLDER, "members.journal")
+PAYMENTS_JOURNAL = os.path.join(DATA_FOLDER, "payments.journal")
+ATTENDANCE_JOURNAL = os.path.join(DATA_FOLDER, "attendance.journal")
+LOCK_FILE = os.path.join(DATA_FOLDER, ".lock")
+SQLITE_FILE = os.path.join(DATA_FOLDER, "gym.db")
+EXPIRY_INDEX_FILE = os.path.join(DATA_FOLDER, "expiry.idx")
+ATTENDANCE_OFFSETS_FILE = os.path.join(DATA_FOLDER, "attendance.offsets")
+REVENUE_ROLLUP_FILE = os.path.join(DATA_FOLDER, "revenue.rollup")
+
+
+def set_data_folder(folder):
+    # use another data folder (e.g. one per branch, or a temp folder)
+    global DATA_FOLDER, MEMBERS_FILE, PAYMENTS_FILE, ATTENDANCE_FILE
+    global MEMBERS_JOURNAL, PAYMENTS_JOURNAL, ATTENDANCE_JOURNAL
+    global LOCK_FILE, SQLITE_FILE, EXPIRY_INDEX_FILE, ATTENDANCE_OFFSETS_FILE
+    global REVENUE_ROLLUP_FILE
+    DATA_FOLDER = folder
+    MEMBERS_FILE = os.path.join(folder, "members.txt")
+    PAYMENTS_FILE = os.path.join(folder, "payments.txt")
+    ATTENDANCE_FILE = os.path.join(folder, "attendance.txt")
+    MEMBERS_JOURNAL = os.path.join(folder, "members.journal")
+    PAYMENTS_JOURNAL = os.path.join(folder, "payments.journal")
+    ATTENDANCE_JOURNAL = os.path.join(folder, "attendance.journal")
+    LOCK_FILE = os.path.join(folder, ".lock")
+    SQLITE_FILE = os.path.join(folder, "gym.db")
+    EXPIRY_INDEX_FILE = os.path.join(folder, "expiry.idx")
+    ATTENDANCE_OFFSETS_FILE = os.path.join(folder, "attendance.offsets")
+    REVENUE_ROLLUP_FILE = os.path.join(folder, "revenue.rollup")
+
+# "text" = the .txt files above, "sqlite" = SQLITE_FILE
+STORAGE_BACKEND = "text"
+
+# append new / changed rows to a journal instead of rewriting files
+USE_JOURNAL = True
+
+# keep a binary snapshot (.snap) of each base file for fast startup
+USE_SNAPSHOT = True
+
+# load rows as slotted Member / Payment / Attendance records instead of dicts
+# (much less memory per row, same record["field"] access)
+COMPACT_RECORDS = False
+
+# advisory lock so other processes (e.g. reports) read a consistent snapshot
+USE_FILE_LOCK = True
+
+# guards journal appends against compaction
+JOURNAL_LOCK = threading.RLock()
 
 # create data folder if it doesnt exist
 def ensure_data_folder():
@@ -13,145 +92,811 @@ def ensure_data_folder():
         os.makedirs(DATA_FOLDER)
 
 
-# MEMBERS 
+# SAFE READ / WRITE
+
+# which lock (if any) this thread holds, so nested data_lock calls
+# (e.g. the loads / saves inside compact_journals) don't lock themselves out
+LOCK_HELD = threading.local()
+
+
+@contextmanager
+def data_lock(shared=False):
+    # advisory lock on data/.lock (does nothing if turned off / unsupported)
+    if not USE_FILE_LOCK or fcntl is None:
+        yield
+        return
+    held = getattr(LOCK_HELD, "mode", None)
+    if held is not None:
+        if held == "shared" and not shared:
+            raise RuntimeError("can't take the data lock exclusively "
+                               "while holding it shared")
+        yield  # covered by the outer lock
+        return
+    ensure_data_folder()
+    with open(LOCK_FILE, "a") as lock_f:
+        fcntl.flock(lock_f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        LOCK_HELD.mode = "shared" if shared else "exclusive"
+        try:
+            yield
+        finally:
+            LOCK_HELD.mode = None
+            fcntl.flock(lock_f, fcntl.LOCK_UN)
+
+
+def open_if_exists(path):
+    # open file for reading, None if missing
+    if not os.path.exists(path):
+        return None
+    return open(path, "r", encoding="utf-8")
+
+
+def open_snapshot(*paths):
+    # open files together under a shared lock; reading happens after the
+    # lock is released (renames don't affect already open files)
+    with data_lock(shared=True):
+        return [open_if_exists(path) for path in paths]
+
+
+def snapshot_path(base_path):
+    # data/members.txt -> data/members.snap
+    return os.path.splitext(base_path)[0] + ".snap"
+
+
+def stat_signature(st):
+    return st.st_size, st.st_mtime_ns
+
+
+def read_base_snapshot(base_path, base_f):
+    # snapshot rows if it was written from exactly this base file
+    if not USE_SNAPSHOT or base_f is None:
+        return None
+    signature = stat_signature(os.fstat(base_f.fileno()))
+    return module_snapshot.read_snapshot(snapshot_path(base_path), signature)
+
+
+def parse_journal_line(parse_line, line, journal_path):
+    # a journal line that can't be parsed (e.g. left over from a crash)
+    # is skipped with a warning instead of stopping every load
+    try:
+        return parse_line(line)
+    except (ValueError, IndexError) as e:
+        print(f"Warning: bad line in {os.path.basename(journal_path)} "
+              f"skipped ({e})")
+        return None
+
+
+def iter_text_records(base_path, journal_path, parse_line, key_name,
+                      upsert=False, use_snapshot=False):
+    # stream records from the base file, then the journal
+    # only the (small) journal is held in memory: for append-only data the
+    # base copy of an ID wins (e.g. crash mid-compaction), upsert means the
+    # journal has the newer version of that row
+    # use_snapshot: read the base rows from the .snap instead - faster, but
+    # it builds all rows at once, so only for the load_* (whole list) path
+    base_f, journal_f = open_snapshot(base_path, journal_path)
+    journal = {}
+    if journal_f is not None:
+        with journal_f:
+            for line in journal_f:
+                record = parse_journal_line(parse_line, line, journal_path)
+                if not record:
+                    continue
+                if upsert:
+                    journal[record[key_name]] = record
+                else:
+                    journal.setdefault(record[key_name], record)
+
+    if base_f is not None:
+        with base_f:
+            base_rows = None
+            if use_snapshot:
+                base_rows = read_base_snapshot(base_path, base_f)
+            if base_rows is None:
+                base_rows = (parse_line(line) for line in base_f)
+            for record in base_rows:
+                if not record:
+                    continue
+                newer = journal.pop(record[key_name], None)
+                yield newer if (upsert and newer) else record
+
+    yield from journal.values()
+
+
+def save_base_snapshot(base_path, rows, column_names, date_fields, signature):
+    # binary copy of a freshly saved base file (tagged with its signature),
+    # parsed dates included so startup skips date parsing too
+    if not USE_SNAPSHOT:
+        return
+    ord_names = [field + "_ord" for field in date_fields]
+    for r in rows:
+        if any(name not in r for name in ord_names):
+            set_date_ordinals(r, date_fields)
+    module_snapshot.write_snapshot(snapshot_path(base_path), rows,
+                                   column_names + ord_names, signature)
+
+
+def write_temp_file(lines):
+    # write lines to a temp file inside DATA_FOLDER, return its path
+    ensure_data_folder()
+    fd, temp_path = tempfile.mkstemp(dir=DATA_FOLDER, prefix=".tmp_", suffix=".txt")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def writable_lines(rows, to_line, key_name, skipped):
+    # text lines for rows; a row with a value the line format can't hold
+    # (e.g. text where a number belongs) is left out of the file with a
+    # warning and added to skipped, instead of failing the whole save
+    for r in rows:
+        try:
+            line = to_line(r)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Warning: {r.get(key_name, '?')} not saved ({e})")
+            skipped.append(r)
+            continue
+        yield line
+
+
+def without_rows(rows, skipped):
+    if not skipped:
+        return rows
+    skipped_ids = {id(r) for r in skipped}
+    return [r for r in rows if id(r) not in skipped_ids]
+
+
+def save_lines_atomic(path, lines, journal_path=None):
+    # temp file + rename, so a crash never leaves a half written file
+    # returns (size, mtime_ns) of the new file
+    temp_path = write_temp_file(lines)
+    signature = stat_signature(os.stat(temp_path))
+    try:
+        os.chmod(temp_path, module_snapshot.file_mode_for(path))
+        with data_lock():
+            os.replace(temp_path, path)
+            if journal_path:
+                clear_journal(journal_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return signature
+
+
+# MEMBERS
+
+def member_to_line(m):
+    # one member as a text line (no newline)
+    return ",".join([
+        m["member_id"],
+        m["name"],
+        str(m["age"]),
+        m["phone"],
+        m["membership_type"],
+        m["start_date"],
+        m["end_date"],
+        m["status"],
+        m["trainer"],
+        m["schedule"],
+    ])
+
+
+def parse_member_line(line):
+    # text line -> member dict (None if line is bad)
+    line = line.strip()
+    if not line:
+        return None
+    fields = line.split(",")
+    if len(fields) < 10:
+        return None
+    return {
+        "member_id": fields[0],
+        "name": fields[1],
+        "age": int(fields[2]),
+        "phone": fields[3],
+        "membership_type": fields[4],
+        "start_date": fields[5],
+        "end_date": fields[6],
+        "status": fields[7],
+        "trainer": fields[8],
+        "schedule": fields[9],
+    }
+
 
 def load_members_from_file():
-    # read members from text file
+    # read members from the selected storage backend (dates parsed)
+    return list(iter_members_from_file(use_snapshot=True))
+
+
+def iter_members_from_file(use_snapshot=False):
+    # stream members one at a time (constant memory for big files)
     ensure_data_folder()
-    members = []
+    if STORAGE_BACKEND == "sqlite":
+        records = module_sqlite.iter_members(SQLITE_FILE)
+    else:
+        records = iter_members_from_text(use_snapshot)
+    if COMPACT_RECORDS:
+        records = map(Member.from_dict, records)
+    # parse dates once here instead of on every report
+    return iter_date_ordinals(records, MEMBER_DATE_FIELDS, "member_id", "member")
 
-    if not os.path.exists(MEMBERS_FILE):
-        return members
 
-    with open(MEMBERS_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            fields = line.split(",")
-            if len(fields) < 10:
-                continue  
-            member = {
-                "member_id": fields[0],
-                "name": fields[1],
-                "age": int(fields[2]),
-                "phone": fields[3],
-                "membership_type": fields[4],
-                "start_date": fields[5],
-                "end_date": fields[6],
-                "status": fields[7],
-                "trainer": fields[8],
-                "schedule": fields[9],
-            }
-            members.append(member)
-    return members
-
-
-def save_members_to_file(members):
-    # write members to text file
+def load_members_from_text():
+    # read members from text file (plus journal, latest version wins)
+    return list(iter_members_from_text(use_snapshot=True))
+
+
+def iter_members_from_text(use_snapshot=False):
+    ensure_data_folder()
+    return iter_text_records(MEMBERS_FILE, MEMBERS_JOURNAL,
+                             parse_member_line, "member_id", upsert=True,
+                             use_snapshot=use_snapshot)
+
+
+def save_members_to_file(members, replace_all=True):
+    # write members to the selected storage backend
+    # (replace_all=False only upserts the given rows, sqlite only)
     ensure_data_folder()
-    with open(MEMBERS_FILE, "w", encoding="utf-8") as f:
-        for m in members:
-            line = ",".join([
-                m["member_id"],
-                m["name"],
-                str(m["age"]),
-                m["phone"],
-                m["membership_type"],
-                m["start_date"],
-                m["end_date"],
-                m["status"],
-                m["trainer"],
-                m["schedule"],
-            ])
-            f.write(line + "\n")
+    if STORAGE_BACKEND == "sqlite":
+        module_sqlite.save_members(SQLITE_FILE, members, replace_all)
+        return
+    save_members_to_text(members)
+
+
+def save_members_to_text(members):
+    # write members to text file (folds the journal in)
+    skipped = []
+    with JOURNAL_LOCK:
+        signature = save_lines_atomic(
+            MEMBERS_FILE,
+            writable_lines(members, member_to_line, "member_id", skipped),
+            MEMBERS_JOURNAL)
+        save_base_snapshot(MEMBERS_FILE, without_rows(members, skipped),
+                           module_sqlite.MEMBER_COLUMNS, MEMBER_DATE_FIELDS,
+                           signature)
 
 
 # PAYMENTS
 
+def payment_to_line(p):
+    # one payment as a text line (no newline)
+    return ",".join([
+        p["payment_id"],
+        p["member_id"],
+        p["date_paid"],
+        f"{p['amount']:.2f}",
+        p["method"],
+        p["membership_type"],
+    ])
+
+
+def parse_payment_line(line):
+    # text line -> payment dict (None if line is bad)
+    line = line.strip()
+    if not line:
+        return None
+    fields = line.split(",")
+    if len(fields) < 6:
+        return None
+    return {
+        "payment_id": fields[0],
+        "member_id": fields[1],
+        "date_paid": fields[2],
+        "amount": float(fields[3]),
+        "method": fields[4],
+        "membership_type": fields[5],
+    }
+
+
 def load_payments_from_file():
-    # read payments from text file
+    # read payments from the selected storage backend (dates parsed)
+    return list(iter_payments_from_file(use_snapshot=True))
+
+
+def iter_payments_from_file(use_snapshot=False):
+    # stream payments one at a time (constant memory for big files)
     ensure_data_folder()
-    payments = []
+    if STORAGE_BACKEND == "sqlite":
+        records = module_sqlite.iter_payments(SQLITE_FILE)
+    else:
+        records = iter_payments_from_text(use_snapshot)
+    if COMPACT_RECORDS:
+        records = map(Payment.from_dict, records)
+    # parse dates once here instead of on every report
+    return iter_date_ordinals(records, PAYMENT_DATE_FIELDS, "payment_id", "payment")
 
-    if not os.path.exists(PAYMENTS_FILE):
-        return payments
 
-    with open(PAYMENTS_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            fields = line.split(",")
-            if len(fields) < 6:
-                continue
-            payment = {
-                "payment_id": fields[0],
-                "member_id": fields[1],
-                "date_paid": fields[2],
-                "amount": float(fields[3]),
-                "method": fields[4],
-                "membership_type": fields[5],
-            }
-            payments.append(payment)
-    return payments
-
-
-def save_payments_to_file(payments):
-    # write payments to text file
+def load_payments_from_text():
+    # read payments from text file (plus journal)
+    return list(iter_payments_from_text(use_snapshot=True))
+
+
+def iter_payments_from_text(use_snapshot=False):
+    ensure_data_folder()
+    return iter_text_records(PAYMENTS_FILE, PAYMENTS_JOURNAL,
+                             parse_payment_line, "payment_id",
+                             use_snapshot=use_snapshot)
+
+
+def save_payments_to_file(payments, replace_all=True):
+    # write payments to the selected storage backend
+    # (replace_all=False only upserts the given rows, sqlite only)
     ensure_data_folder()
-    with open(PAYMENTS_FILE, "w", encoding="utf-8") as f:
-        for p in payments:
-            line = ",".join([
-                p["payment_id"],
-                p["member_id"],
-                p["date_paid"],
-                f"{p['amount']:.2f}",
-                p["method"],
-                p["membership_type"],
-            ])
-            f.write(line + "\n")
+    if STORAGE_BACKEND == "sqlite":
+        module_sqlite.save_payments(SQLITE_FILE, payments, replace_all)
+        return
+    save_payments_to_text(payments)
+
+
+def save_payments_to_text(payments):
+    # write payments to text file (folds the journal in)
+    skipped = []
+    with JOURNAL_LOCK:
+        signature = save_lines_atomic(
+            PAYMENTS_FILE,
+            writable_lines(payments, payment_to_line, "payment_id", skipped),
+            PAYMENTS_JOURNAL)
+        save_base_snapshot(PAYMENTS_FILE, without_rows(payments, skipped),
+                           module_sqlite.PAYMENT_COLUMNS, PAYMENT_DATE_FIELDS,
+                           signature)
+
+
+#  ATTENDANCE
 
+def attendance_to_line(a):
+    # one attendance record as a text line (no newline)
+    return ",".join([
+        a["attendance_id"],
+        a["member_id"],
+        a["date"],
+        a["checkin"],
+        a["checkout"],
+    ])
+
+
+def parse_attendance_line(line):
+    # text line -> attendance dict (None if line is bad)
+    line = line.strip()
+    if not line:
+        return None
+    fields = line.split(",")
+    if len(fields) < 5:
+        return None
+    return {
+        "attendance_id": fields[0],
+        "member_id": fields[1],
+        "date": fields[2],
+        "checkin": fields[3],
+        "checkout": fields[4],
+    }
 
-#  ATTENDANCE 
 
 def load_attendance_from_file():
-    # read attendance from text file
+    # read attendance from the selected storage backend (dates parsed)
+    return list(iter_attendance_from_file(use_snapshot=True))
+
+
+def iter_attendance_from_file(use_snapshot=False):
+    # stream attendance one at a time (constant memory for big files)
+    ensure_data_folder()
+    if STORAGE_BACKEND == "sqlite":
+        records = module_sqlite.iter_attendance(SQLITE_FILE)
+    else:
+        records = iter_attendance_from_text(use_snapshot)
+    if COMPACT_RECORDS:
+        records = map(Attendance.from_dict, records)
+    # parse dates once here instead of on every report
+    return iter_date_ordinals(records, ATTENDANCE_DATE_FIELDS, "attendance_id", "attendance")
+
+
+def load_attendance_from_text():
+    # read attendance from text file (plus journal)
+    return list(iter_attendance_from_text(use_snapshot=True))
+
+
+def iter_attendance_from_text(use_snapshot=False):
     ensure_data_folder()
-    attendance_list = []
+    return iter_text_records(ATTENDANCE_FILE, ATTENDANCE_JOURNAL,
+                             parse_attendance_line, "attendance_id",
+                             use_snapshot=use_snapshot)
+
+
+def save_attendance_to_file(attendance_list, replace_all=True):
+    # write attendance to the selected storage backend
+    # (replace_all=False only upserts the given rows, sqlite only)
+    ensure_data_folder()
+    if STORAGE_BACKEND == "sqlite":
+        module_sqlite.save_attendance(SQLITE_FILE, attendance_list, replace_all)
+        return
+    save_attendance_to_text(attendance_list)
+
+
+def save_attendance_to_text(attendance_list):
+    # write attendance to text file (folds the journal in)
+    skipped = []
+    with JOURNAL_LOCK:
+        signature = save_lines_atomic(
+            ATTENDANCE_FILE,
+            writable_lines(attendance_list, attendance_to_line,
+                           "attendance_id", skipped),
+            ATTENDANCE_JOURNAL)
+        save_base_snapshot(ATTENDANCE_FILE,
+                           without_rows(attendance_list, skipped),
+                           module_sqlite.ATTENDANCE_COLUMNS,
+                           ATTENDANCE_DATE_FIELDS, signature)
+
+
+# LOAD / SAVE EVERYTHING
+
+def load_all_data():
+    # load all three files into change-tracking collections
+    # (sqlite: payments / attendance stay in the database, see SqliteTable)
+    members = MemberStore(load_members_from_file(), load_expiry_index())
+    if STORAGE_BACKEND == "sqlite":
+        ensure_data_folder()
+        payments = module_sqlite.SqliteTable(
+            SQLITE_FILE, "payments",
+            lambda r: set_date_ordinals(r, PAYMENT_DATE_FIELDS))
+        attendance_list = module_sqlite.SqliteTable(
+            SQLITE_FILE, "attendance",
+            lambda r: set_date_ordinals(r, ATTENDANCE_DATE_FIELDS))
+        return members, payments, attendance_list
+    payments = PaymentList(load_payments_from_file(), load_revenue_rollup())
+    attendance_list = AttendanceList(load_attendance_from_file())
+    return members, payments, attendance_list
+
 
-    if not os.path.exists(ATTENDANCE_FILE):
-        return attendance_list
+def save_tracked(rows, save_all, journal_path, to_line, key_name):
+    # save one collection only if it changed
+    if not isinstance(rows, (TrackedList, module_sqlite.SqliteTable)):
+        save_all(rows)  # plain list, no tracking - full save
+        return
+    if not rows.dirty:
+        return
+    full_save = getattr(rows, "needs_full_save", False)  # rows removed etc.
+    if STORAGE_BACKEND == "sqlite" and not full_save:
+        save_all(rows.dirty_rows(), replace_all=False)
+    elif USE_JOURNAL and not full_save:
+        append_to_journal(journal_path, list(writable_lines(
+            rows.dirty_rows(), to_line, key_name, [])))
+    else:
+        save_all(rows)
+    rows.mark_clean()
 
-    with open(ATTENDANCE_FILE, "r", encoding="utf-8") as f:
+
+def save_changes(members=None, payments=None, attendance_list=None):
+    # persist only what changed (pass the collections you touched)
+    if members is not None:
+        save_tracked(members, save_members_to_file, MEMBERS_JOURNAL,
+                     member_to_line, "member_id")
+    if payments is not None:
+        save_tracked(payments, save_payments_to_file, PAYMENTS_JOURNAL,
+                     payment_to_line, "payment_id")
+    if attendance_list is not None:
+        save_tracked(attendance_list, save_attendance_to_file,
+                     ATTENDANCE_JOURNAL, attendance_to_line, "attendance_id")
+
+
+# SAVED INDEXES
+
+def file_signature(paths):
+    # size + modification time of files (to spot stale index files)
+    parts = []
+    for path in paths:
+        if os.path.exists(path):
+            st = os.stat(path)
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        else:
+            parts.append("-")
+    return ";".join(parts)
+
+
+def members_signature():
+    # signature of wherever members are stored right now
+    if STORAGE_BACKEND == "sqlite":
+        return file_signature([SQLITE_FILE])
+    return file_signature([MEMBERS_FILE, MEMBERS_JOURNAL])
+
+
+def save_expiry_index(members):
+    # save the sorted end date index next to the data files
+    # (call after the last save so the signature matches)
+    lines = [members_signature()]
+    lines.extend(f"{end_ord},{member_id}"
+                 for end_ord, member_id in members.expiry.pairs)
+    save_lines_atomic(EXPIRY_INDEX_FILE, lines)
+
+
+def load_expiry_index():
+    # saved end date index, None if missing or older than the member data
+    if not os.path.exists(EXPIRY_INDEX_FILE):
+        return None
+    pairs = []
+    with open(EXPIRY_INDEX_FILE, "r", encoding="utf-8") as f:
+        if f.readline().strip() != members_signature():
+            return None
         for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            fields = line.split(",")
-            if len(fields) < 5:
-                continue
-            record = {
-                "attendance_id": fields[0],
-                "member_id": fields[1],
-                "date": fields[2],
-                "checkin": fields[3],
-                "checkout": fields[4],
-            }
-            attendance_list.append(record)
-    return attendance_list
-
-
-def save_attendance_to_file(attendance_list):
-    # write attendance to text file
+            end_ord, member_id = line.strip().split(",", 1)
+            pairs.append((int(end_ord), member_id))
+    return ExpiryIndex(pairs)
+
+
+def payments_signature():
+    if STORAGE_BACKEND == "sqlite":
+        return file_signature([SQLITE_FILE])
+    return file_signature([PAYMENTS_FILE, PAYMENTS_JOURNAL])
+
+
+def save_revenue_rollup(payments):
+    # save the monthly revenue rollup (call after the last save, like
+    # save_expiry_index); totals use repr so they load back exactly
+    # (payments left in sqlite have no rollup, nothing to save)
+    if getattr(payments, "rollup", None) is None:
+        return
+    lines = [payments_signature()]
+    lines.extend(f"{year},{month},{mtype},{method},{count},{total!r}"
+                 for (year, month, mtype, method), (count, total)
+                 in payments.rollup.cells.items())
+    save_lines_atomic(REVENUE_ROLLUP_FILE, lines)
+
+
+def load_revenue_rollup():
+    # saved rollup, None if missing or older than the payment data
+    if not os.path.exists(REVENUE_ROLLUP_FILE):
+        return None
+    cells = []
+    with open(REVENUE_ROLLUP_FILE, "r", encoding="utf-8") as f:
+        if f.readline().strip() != payments_signature():
+            return None
+        for line in f:
+            year, month, mtype, method, count, total = \
+                line.rstrip("\n").split(",")
+            cells.append(((year, month, mtype, method),
+                          int(count), float(total)))
+    return RevenueRollup(cells)
+
+
+# ATTENDANCE OFFSET INDEX
+# sidecar for attendance.txt: every line's byte offset sorted by date and
+# by ID, so single records / date slices are read from the mmapped file
+# without parsing the rest of it
+#   header  magic, base size, base mtime_ns, entry count
+#   entries (key, offset, length) sorted by date ordinal, then by ID number
+
+OFFSETS_MAGIC = b"GYMOFS1\0"
+OFFSETS_HEADER = struct.Struct("<8sQQQ")
+OFFSETS_ENTRY = struct.Struct("<qQI")
+
+
+def write_attendance_offsets(base_f, signature):
+    # one pass over the (binary) base file, then write the sorted sidecar
+    by_date = []
+    by_id = []
+    offset = 0
+    base_f.seek(0)
+    for line in base_f:
+        fields = line.split(b",")
+        if len(fields) >= 5:
+            length = len(line.rstrip(b"\r\n"))
+            date_ord = date_to_ordinal(fields[2].decode("utf-8")) or 0
+            by_date.append((date_ord, offset, length))
+            number = id_number(fields[0].decode("utf-8"), "A")
+            by_id.append((number, offset, length))
+        offset += len(line)
+    by_date.sort()
+    by_id.sort()
+
+    ensure_data_folder()
+    fd, temp_path = tempfile.mkstemp(dir=DATA_FOLDER, prefix=".tmp_",
+                                     suffix=".offsets")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(OFFSETS_HEADER.pack(OFFSETS_MAGIC, signature[0],
+                                        signature[1], len(by_date)))
+            for entry in by_date + by_id:
+                f.write(OFFSETS_ENTRY.pack(*entry))
+        os.chmod(temp_path,
+                 module_snapshot.file_mode_for(ATTENDANCE_OFFSETS_FILE))
+        os.replace(temp_path, ATTENDANCE_OFFSETS_FILE)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def offsets_are_fresh(signature):
+    if not os.path.exists(ATTENDANCE_OFFSETS_FILE):
+        return False
+    with open(ATTENDANCE_OFFSETS_FILE, "rb") as f:
+        header = f.read(OFFSETS_HEADER.size)
+    if len(header) < OFFSETS_HEADER.size:
+        return False
+    magic, size, mtime_ns, _ = OFFSETS_HEADER.unpack(header)
+    return magic == OFFSETS_MAGIC and (size, mtime_ns) == tuple(signature)
+
+
+def first_entry_at_least(index_mm, start, count, key):
+    # binary search over one sorted section of the sidecar
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        entry_key = OFFSETS_ENTRY.unpack_from(
+            index_mm, start + mid * OFFSETS_ENTRY.size)[0]
+        if entry_key < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def read_attendance_by_offsets(section, first_key, last_key):
+    # records whose key (date ordinal / ID number) is in the range,
+    # read straight from the mmapped attendance.txt
+    ensure_data_folder()
+    if not os.path.exists(ATTENDANCE_FILE) or os.path.getsize(ATTENDANCE_FILE) == 0:
+        return []
+    records = []
+    with open(ATTENDANCE_FILE, "rb") as base_f:
+        signature = stat_signature(os.fstat(base_f.fileno()))
+        if not offsets_are_fresh(signature):
+            write_attendance_offsets(base_f, signature)
+        with open(ATTENDANCE_OFFSETS_FILE, "rb") as index_f, \
+                mmap.mmap(index_f.fileno(), 0, access=mmap.ACCESS_READ) as index_mm, \
+                mmap.mmap(base_f.fileno(), 0, access=mmap.ACCESS_READ) as base_mm:
+            count = OFFSETS_HEADER.unpack_from(index_mm, 0)[3]
+            start = OFFSETS_HEADER.size
+            if section == "id":
+                start += count * OFFSETS_ENTRY.size
+            pos = first_entry_at_least(index_mm, start, count, first_key)
+            while pos < count:
+                key, offset, length = OFFSETS_ENTRY.unpack_from(
+                    index_mm, start + pos * OFFSETS_ENTRY.size)
+                if key > last_key:
+                    break
+                line = base_mm[offset:offset + length].decode("utf-8")
+                record = parse_attendance_line(line)
+                if record:
+                    records.append(record)
+                pos += 1
+    return records
+
+
+def read_journal_attendance(keep):
+    # journal records (not in the offset index yet) that pass keep(record)
+    journal_f = open_snapshot(ATTENDANCE_JOURNAL)[0]
+    if journal_f is None:
+        return []
+    with journal_f:
+        records = (parse_journal_line(parse_attendance_line, line,
+                                      ATTENDANCE_JOURNAL)
+                   for line in journal_f)
+        return [r for r in records if r and keep(r)]
+
+
+def read_attendance_record(attendance_id):
+    # one attendance record by ID without loading the file (None if missing)
+    number = id_number(attendance_id, "A")
+    for record in read_attendance_by_offsets("id", number, number):
+        if record["attendance_id"] == attendance_id:
+            break
+    else:
+        journal = read_journal_attendance(
+            lambda r: r["attendance_id"] == attendance_id)
+        if not journal:
+            return None
+        record = journal[0]
+    set_date_ordinals(record, ATTENDANCE_DATE_FIELDS)
+    return record
+
+
+def read_attendance_in_range(start_date, end_date):
+    # attendance in a date range straight from disk (sorted by date)
+    first, last = date_to_ordinal(start_date), date_to_ordinal(end_date)
+    if first is None or last is None:
+        return []
+    records = read_attendance_by_offsets("date", first, last)
+    records += read_journal_attendance(
+        lambda r: start_date <= r["date"] <= end_date)
+    for record in records:
+        set_date_ordinals(record, ATTENDANCE_DATE_FIELDS)
+    return records
+
+
+def read_attendance_on_date(date_str):
+    # like get_attendance_on_date but works on files bigger than RAM
+    return read_attendance_in_range(date_str, date_str)
+
+
+def migrate_text_to_sqlite(db_path=None):
+    # one-shot copy of the .txt files (and journals) into sqlite
+    db_path = db_path or SQLITE_FILE
+    ensure_data_folder()
+    members = load_members_from_text()
+    payments = load_payments_from_text()
+    attendance_list = load_attendance_from_text()
+    module_sqlite.save_members(db_path, members)
+    module_sqlite.save_payments(db_path, payments)
+    module_sqlite.save_attendance(db_path, attendance_list)
+    return len(members), len(payments), len(attendance_list)
+
+
+# JOURNAL
+
+def append_to_journal(path, lines):
+    # append lines and fsync so a crash can't lose them
+    if not lines:
+        return
     ensure_data_folder()
-    with open(ATTENDANCE_FILE, "w", encoding="utf-8") as f:
-        for a in attendance_list:
-            line = ",".join([
-                a["attendance_id"],
-                a["member_id"],
-                a["date"],
-                a["checkin"],
-                a["checkout"],
-            ])
-            f.write(line + "\n")
+    with JOURNAL_LOCK, data_lock():
+        drop_torn_tail(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def drop_torn_tail(path):
+    # a crash mid-append can leave a last line without its newline; that
+    # write never finished, so cut it off (the next append would otherwise
+    # be glued onto it)
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        end = size
+        while end > 0:
+            start = max(end - 4096, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        print(f"Warning: unfinished line dropped from "
+              f"{os.path.basename(path)}")
+        f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def clear_journal(path):
+    # journal is folded into the base file, so drop it
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def compact_journals():
+    # fold journals back into the base files; the exclusive lock is held
+    # from reading the journal until it's deleted, so a line another
+    # process appends in between can't be lost
+    with JOURNAL_LOCK, data_lock():
+        if os.path.exists(MEMBERS_JOURNAL):
+            save_members_to_text(load_members_from_text())
+        if os.path.exists(PAYMENTS_JOURNAL):
+            save_payments_to_text(load_payments_from_text())
+        if os.path.exists(ATTENDANCE_JOURNAL):
+            save_attendance_to_text(load_attendance_from_text())
+
+
+def start_background_compaction(interval_seconds=300):
+    # compact journals every few minutes in a daemon thread
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            compact_journals()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
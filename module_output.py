@@ -1,10 +1,28 @@
 # output functions
+import sys
+
+# lists are built as strings and written in big chunks with
+# sys.stdout.write (a print() per line is very slow over SSH)
+
+# "full" = one box per record, "compact" = one table row per record,
+# "auto" = compact once a list has more than COMPACT_OVER records
+LIST_FORMAT = "auto"
+COMPACT_OVER = 200
+
+# records per page for long lists (0 = no paging)
+PAGE_SIZE = 0
+
+# flush the buffer to the terminal once it gets this big (characters)
+CHUNK_SIZE = 64 * 1024
+
+
+def format_title(text):
+    return "\n" + "=" * 50 + "\n" + text + "\n" + "=" * 50 + "\n"
+
 
 def print_title(text):
     # title box
-    print("\n" + "=" * 50)
-    print(text)
-    print("=" * 50)
+    sys.stdout.write(format_title(text))
 
 
 def print_main_menu():
@@ -17,86 +35,175 @@ def print_main_menu():
     print("5. Exit")
 
 
+def format_member(member):
+    return (
+        "-" * 50 + "\n"
+        f"Member ID   : {member['member_id']}\n"
+        f"Name        : {member['name']}\n"
+        f"Age         : {member['age']}\n"
+        f"Phone       : {member['phone']}\n"
+        f"Type        : {member['membership_type']}\n"
+        f"Start Date  : {member['start_date']}\n"
+        f"End Date    : {member['end_date']}\n"
+        f"Status      : {member['status']}\n"
+        f"Trainer     : {member['trainer']}\n"
+        f"Schedule    : {member['schedule']}\n"
+        + "-" * 50 + "\n"
+    )
+
+
+def format_payment(payment):
+    return (
+        "-" * 50 + "\n"
+        f"Payment ID  : {payment['payment_id']}\n"
+        f"Member ID   : {payment['member_id']}\n"
+        f"Date Paid   : {payment['date_paid']}\n"
+        f"Amount      : {payment['amount']:.2f}\n"
+        f"Method      : {payment['method']}\n"
+        f"Membership  : {payment['membership_type']}\n"
+        + "-" * 50 + "\n"
+    )
+
+
+def format_attendance(record):
+    return (
+        "-" * 50 + "\n"
+        f"Attendance ID: {record['attendance_id']}\n"
+        f"Member ID    : {record['member_id']}\n"
+        f"Date         : {record['date']}\n"
+        f"Check-in     : {record['checkin']}\n"
+        f"Check-out    : {record['checkout']}\n"
+        + "-" * 50 + "\n"
+    )
+
+
+# compact table rows (header, then one line per record)
+
+MEMBER_TABLE_HEADER = (
+    f"{'ID':<8} {'Name':<22} {'Type':<10} {'Start':<10} {'End':<10} "
+    f"{'Status':<8} {'Trainer'}\n"
+)
+PAYMENT_TABLE_HEADER = (
+    f"{'ID':<8} {'Member':<8} {'Date':<10} {'Amount':>10} "
+    f"{'Method':<10} {'Membership'}\n"
+)
+ATTENDANCE_TABLE_HEADER = (
+    f"{'ID':<8} {'Member':<8} {'Date':<10} {'In':<5} {'Out'}\n"
+)
+
+
+def format_member_row(m):
+    return (f"{m['member_id']:<8} {m['name'][:22]:<22} "
+            f"{m['membership_type']:<10} {m['start_date']:<10} "
+            f"{m['end_date']:<10} {m['status']:<8} {m['trainer']}\n")
+
+
+def format_payment_row(p):
+    return (f"{p['payment_id']:<8} {p['member_id']:<8} {p['date_paid']:<10} "
+            f"{p['amount']:>10.2f} {p['method']:<10} {p['membership_type']}\n")
+
+
+def format_attendance_row(a):
+    return (f"{a['attendance_id']:<8} {a['member_id']:<8} {a['date']:<10} "
+            f"{a['checkin']:<5} {a['checkout']}\n")
+
+
+def ask_next_page():
+    # False when the user wants to stop paging
+    try:
+        answer = input("-- more (Enter = next page, q = quit) -- ")
+    except EOFError:
+        return False
+    return answer.strip().lower() != "q"
+
+
+def write_records(records, format_record, header="", page_size=None):
+    # render records into a buffer, write it out in CHUNK_SIZE pieces;
+    # with paging, flush and wait after every page_size records
+    if page_size is None:
+        page_size = PAGE_SIZE
+    out = sys.stdout
+    buffer = [header]
+    size = len(header)
+    for count, record in enumerate(records, start=1):
+        text = format_record(record)
+        buffer.append(text)
+        size += len(text)
+        at_page_end = page_size and count % page_size == 0
+        if size >= CHUNK_SIZE or at_page_end:
+            out.write("".join(buffer))
+            buffer = []
+            size = 0
+        if at_page_end and count < len(records):
+            out.flush()
+            if not ask_next_page():
+                return
+            if header:
+                buffer = [header]
+                size = len(header)
+    out.write("".join(buffer))
+    out.flush()
+
+
+def print_record_list(records, title, empty_text, format_full, header,
+                      format_row, compact=None, page_size=None):
+    # shared body of the print_*_list functions
+    if compact is None:
+        compact = (LIST_FORMAT == "compact"
+                   or (LIST_FORMAT == "auto" and len(records) > COMPACT_OVER))
+    print_title(title)
+    if not records:
+        print(empty_text)
+        return
+    if compact:
+        write_records(records, format_row, header, page_size)
+    else:
+        write_records(records, format_full, "", page_size)
+
+
 def print_member(member):
     # show individual member details
-    print("-" * 50)
-    print(f"Member ID   : {member['member_id']}")
-    print(f"Name        : {member['name']}")
-    print(f"Age         : {member['age']}")
-    print(f"Phone       : {member['phone']}")
-    print(f"Type        : {member['membership_type']}")
-    print(f"Start Date  : {member['start_date']}")
-    print(f"End Date    : {member['end_date']}")
-    print(f"Status      : {member['status']}")
-    print(f"Trainer     : {member['trainer']}")
-    print(f"Schedule    : {member['schedule']}")
-    print("-" * 50)
-
-
-def print_member_list(members, title="Members"):
+    sys.stdout.write(format_member(member))
+
+
+def print_member_list(members, title="Members", compact=None, page_size=None):
     # list all members
-    print_title(title)
-    if not members:
-        print("No members found.")
-        return
-    for m in members:
-        print_member(m)
+    print_record_list(members, title, "No members found.", format_member,
+                      MEMBER_TABLE_HEADER, format_member_row,
+                      compact, page_size)
 
 
 def print_payment(payment):
     # show one payment
-    print("-" * 50)
-    print(f"Payment ID  : {payment['payment_id']}")
-    print(f"Member ID   : {payment['member_id']}")
-    print(f"Date Paid   : {payment['date_paid']}")
-    print(f"Amount      : {payment['amount']:.2f}")
-    print(f"Method      : {payment['method']}")
-    print(f"Membership  : {payment['membership_type']}")
-    print("-" * 50)
+    sys.stdout.write(format_payment(payment))
 
 
-def print_payment_list(payments, title="Payments"):
+def print_payment_list(payments, title="Payments", compact=None,
+                       page_size=None):
     # list of payments
-    print_title(title)
-    if not payments:
-        print("No payments found.")
-        return
-    for p in payments:
-        print_payment(p)
+    print_record_list(payments, title, "No payments found.", format_payment,
+                      PAYMENT_TABLE_HEADER, format_payment_row,
+                      compact, page_size)
 
 
 def print_attendance(record):
     # show one attendance record
-    print("-" * 50)
-    print(f"Attendance ID: {record['attendance_id']}")
-    print(f"Member ID    : {record['member_id']}")
-    print(f"Date         : {record['date']}")
-    print(f"Check-in     : {record['checkin']}")
-    print(f"Check-out    : {record['checkout']}")
-    print("-" * 50)
+    sys.stdout.write(format_attendance(record))
 
 
-def print_attendance_list(attendance_list, title="Attendance Records"):
+def print_attendance_list(attendance_list, title="Attendance Records",
+                          compact=None, page_size=None):
     # list attendance
-    print_title(title)
-    if not attendance_list:
-        print("No attendance records found.")
-        return
-    for r in attendance_list:
-        print_attendance(r)
+    print_record_list(attendance_list, title, "No attendance records found.",
+                      format_attendance, ATTENDANCE_TABLE_HEADER,
+                      format_attendance_row, compact, page_size)
 
 
-def print_trainer_summary(members):
-    # show members assigned to trainers (only if not expired)
+def print_trainer_summary(trainers):
+    # show members assigned to trainers (from group_members_by_trainer,
+    # so expired members are already left out)
     print_title("Trainer Assignment Summary")
 
-    trainers = {}
-    for m in members:
-        if m["status"].lower() == "expired":
-            continue
-        trainer = m["trainer"]
-        trainers.setdefault(trainer, []).append(m)
-
     if not trainers:
         print("No active or pending members assigned.")
         return
@@ -110,6 +217,21 @@ def print_trainer_summary(members):
             )
 
 
+def print_trainer_load(load):
+    # members per trainer / schedule slot against capacity
+    print_title("Trainer Load and Capacity")
+    if not load:
+        print("No active or pending members assigned.")
+        return
+
+    for trainer, info in load.items():
+        full = " (FULL)" if info["count"] >= info["capacity"] else ""
+        print(f"\n{trainer}: {info['count']}/{info['capacity']} member(s){full}")
+        for schedule, count in info["slots"].items():
+            full = " (FULL)" if count >= info["slot_capacity"] else ""
+            print(f"  {schedule:20} : {count}/{info['slot_capacity']}{full}")
+
+
 def print_financial_summary(total_amount, count):
     # simple financial summary
     print_title("Financial Summary")
@@ -117,6 +239,16 @@ def print_financial_summary(total_amount, count):
     print(f"Total amount      : {total_amount:.2f}")
 
 
+def print_monthly_revenue_breakdown(breakdown, month_label):
+    # payments per membership type / method for one month
+    print_title(f"Revenue for {month_label}")
+    if not breakdown:
+        print("No payments in this month.")
+        return
+    for (mtype, method), (count, total) in breakdown.items():
+        print(f"{mtype:10} {method:10} : {count:>5} payment(s) {total:>12.2f}")
+
+
 def print_busiest_day_report(busiest_day, stats_dict):
     # busiest day report
     print_title("Busiest Day of the Week (Attendance)")
@@ -132,6 +264,37 @@ def print_busiest_day_report(busiest_day, stats_dict):
         print("\nOverall busiest day:", busiest_day)
 
 
+def print_occupancy_report(averages, visits, skipped):
+    # heatmap: average people in the gym per time slot (rows) and weekday
+    # (columns); slots that are empty on every day are left out
+    print_title("Occupancy by Time Slot (average people present)")
+    if not visits:
+        print("No attendance data available.")
+        return
+    slot_minutes = 24 * 60 // len(averages[0])
+    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    lines = ["Time  " + "".join(f"{d:>7}" for d in days) + "\n"]
+    for slot in range(len(averages[0])):
+        row = [day[slot] for day in averages]
+        if not any(row):
+            continue
+        minutes = slot * slot_minutes
+        cells = "".join(f"{v:>7.1f}" if v else f"{'.':>7}" for v in row)
+        lines.append(f"{minutes // 60:02d}:{minutes % 60:02d} {cells}\n")
+
+    lines.append("\nPeak per day:\n")
+    for name, day in zip(days, averages):
+        peak = max(day)
+        if peak:
+            minutes = day.index(peak) * slot_minutes
+            lines.append(f"  {name}: {peak:.1f} at "
+                         f"{minutes // 60:02d}:{minutes % 60:02d}\n")
+    lines.append(f"\nVisits counted: {visits}\n")
+    if skipped:
+        lines.append(f"Skipped (bad date/time): {skipped}\n")
+    sys.stdout.write("".join(lines))
+
+
 def print_revenue_by_membership_type(revenue_dict):
     # revenue by membership type
     print_title("Revenue by Membership Type")
@@ -153,3 +316,33 @@ def print_expiry_alert(expiring_members, days):
     print(f"{len(expiring_members)} member(s) found:")
     for m in expiring_members:
         print(f"- {m['member_id']} | {m['name']} | End Date: {m['end_date']}")
+
+
+def print_auto_expired(expired_members):
+    # members the status engine just expired
+    print_title("Memberships expired automatically (end date passed)")
+    print(f"{len(expired_members)} member(s) updated:")
+    for m in expired_members:
+        print(f"- {m['member_id']} | {m['name']} | End Date: {m['end_date']}")
+
+
+def print_import_summary(kind, summary):
+    # result of a batch import
+    print_title(f"Batch Import ({kind})")
+    print(f"Imported    : {summary['imported']} row(s)")
+    print(f"Rejected    : {len(summary['rejected'])} row(s)")
+    print(f"Time        : {summary['seconds']:.3f} s")
+    print(f"Throughput  : {summary['rows_per_second']:.0f} rows/s")
+    for line_no, error in summary["rejected"][:20]:
+        print(f"  line {line_no}: {error}")
+    if len(summary["rejected"]) > 20:
+        print(f"  ... and {len(summary['rejected']) - 20} more")
+
+
+def print_branch_report(report, year, month):
+    # one branch (or the chain-wide totals) from module_branches
+    print_title(f"Branch: {report['branch']}")
+    print_revenue_by_membership_type(report["revenue"])
+    print_busiest_day_report(report["busiest_day"], report["visits"])
+    print_financial_summary(report["month_total"], report["month_count"])
+    print(f"Month             : {year}-{month}")
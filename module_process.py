@@ -1,22 +1,292 @@
 # process functions
-from datetime import datetime, timedelta
+import math
+import threading
+from datetime import date, datetime
 from collections import Counter
 
+import module_analytics
+import module_sqlite
+from module_store import (
+    MemberStore,
+    TrackedList,
+    HistoryList,
+    AttendanceList,
+    OccupancyGrid,
+    time_to_minutes,
+)
 
-def generate_new_id(prefix, existing_items, key_name):
-    # make new ID like M001 / P001
+
+# digits used for new IDs (M001); bigger numbers just grow (M1000)
+# (read on every call, so it can be changed at runtime)
+ID_WIDTH = 3
+
+
+def format_id(prefix, number, width=None):
+    # build ID string like M001 (width None: ID_WIDTH)
+    if width is None:
+        width = ID_WIDTH
+    return f"{prefix}{number:0{width}d}"
+
+
+def id_number(item_id, prefix):
+    # numeric part of an ID (for sorting M999 before M1000)
+    try:
+        return int(item_id[len(prefix):])
+    except ValueError:
+        return 0
+
+
+def highest_id_number(prefix, existing_items, key_name):
+    # biggest number already used with this prefix
     max_num = 0
     for item in existing_items:
         item_id = item.get(key_name, "")
         if item_id.startswith(prefix):
-            try:
-                num = int(item_id[len(prefix):])
-                if num > max_num:
-                    max_num = num
-            except ValueError:
+            num = id_number(item_id, prefix)
+            if num > max_num:
+                max_num = num
+    return max_num
+
+
+class IdAllocator:
+    # per-prefix sequence, seeded once from the loaded records
+    # so new IDs are handed out without rescanning every record
+
+    def __init__(self, width=None):
+        self.width = width  # None: follow ID_WIDTH
+        self.last = {}
+        self.lock = threading.Lock()
+
+    def seed(self, prefix, existing_items, key_name):
+        # remember highest existing number for this prefix
+        max_num = highest_id_number(prefix, existing_items, key_name)
+        with self.lock:
+            self.last[prefix] = max(self.last.get(prefix, 0), max_num)
+
+    def is_seeded(self, prefix):
+        return prefix in self.last
+
+    def reset(self):
+        with self.lock:
+            self.last.clear()
+
+    def next_id(self, prefix):
+        # next ID for prefix (safe to call from several threads)
+        with self.lock:
+            number = self.last.get(prefix, 0) + 1
+            self.last[prefix] = number
+        return format_id(prefix, number, self.width)
+
+
+# shared allocator used by generate_new_id once seeded
+ID_ALLOCATOR = IdAllocator()
+
+
+def seed_id_allocator(members, payments, attendance_list):
+    # call once after loading data
+    ID_ALLOCATOR.reset()
+    ID_ALLOCATOR.seed("M", members, "member_id")
+    ID_ALLOCATOR.seed("P", payments, "payment_id")
+    ID_ALLOCATOR.seed("A", attendance_list, "attendance_id")
+
+
+def generate_new_id(prefix, existing_items, key_name):
+    # make new ID like M001 / P001
+    if ID_ALLOCATOR.is_seeded(prefix):
+        return ID_ALLOCATOR.next_id(prefix)
+    # not seeded (old callers) - scan the records
+    new_num = highest_id_number(prefix, existing_items, key_name) + 1
+    return format_id(prefix, new_num)
+
+
+# DATES
+
+# date fields parsed once at load, stored next to the string as <field>_ord
+MEMBER_DATE_FIELDS = ("start_date", "end_date")
+PAYMENT_DATE_FIELDS = ("date_paid",)
+ATTENDANCE_DATE_FIELDS = ("date",)
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday",
+                 "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def date_to_ordinal(date_str):
+    # "YYYY-MM-DD" -> date ordinal (int), None if not a real date
+    try:
+        year, month, day = date_str.split("-")
+        return date(int(year), int(month), int(day)).toordinal()
+    except (ValueError, AttributeError):
+        return None
+
+
+def ordinal_weekday(ordinal):
+    # 0 = Monday (ordinal 1 is Monday 0001-01-01)
+    return (ordinal - 1) % 7
+
+
+def set_date_ordinals(record, date_fields):
+    # parse date strings of one record, return False if any is bad
+    ok = True
+    for field in date_fields:
+        ordinal = date_to_ordinal(record[field])
+        record[field + "_ord"] = ordinal
+        if ordinal is None:
+            ok = False
+    return ok
+
+
+def add_date_ordinals(records, date_fields, key_name, label):
+    # parse dates of all loaded records once and report bad ones once
+    return list(iter_date_ordinals(records, date_fields, key_name, label))
+
+
+def iter_date_ordinals(records, date_fields, key_name, label):
+    # same as add_date_ordinals but streaming (warning printed at the end)
+    bad_count = 0
+    bad_ids = []
+    for r in records:
+        if all(field + "_ord" in r for field in date_fields):
+            # already parsed (e.g. rows from a binary snapshot)
+            ok = all(r[field + "_ord"] is not None for field in date_fields)
+        else:
+            ok = set_date_ordinals(r, date_fields)
+        if not ok:
+            bad_count += 1
+            if len(bad_ids) < 10:
+                bad_ids.append(r[key_name])
+        yield r
+    if bad_count:
+        more = " ..." if bad_count > len(bad_ids) else ""
+        print(f"Warning: {bad_count} {label} record(s) have invalid "
+              f"dates and are skipped by date reports: "
+              f"{', '.join(bad_ids)}{more}")
+
+
+def get_date_ordinal(record, field):
+    # parsed date if the loader stored it, otherwise parse now
+    key = field + "_ord"
+    if key in record:
+        return record[key]
+    return date_to_ordinal(record[field])
+
+
+# VALIDATION
+# for data that doesn't come through module_input (server requests, CSV
+# imports): each clean_* returns a checked / converted copy, or raises
+# ValueError before anything is changed
+
+MEMBER_TEXT_FIELDS = ("name", "phone", "membership_type", "trainer", "schedule")
+MEMBER_DATE_TEXT_FIELDS = ("start_date", "end_date")
+MEMBER_STATUSES = ("active", "expired", "pending")
+
+
+def clean_text(value, name):
+    # non-empty text that can't break the comma separated line format
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{name} must be non-empty text")
+    if "," in value or "\n" in value or "\r" in value:
+        raise ValueError(f"{name} can't contain commas or line breaks")
+    return value.strip()
+
+
+def clean_date(value, name):
+    # "YYYY-MM-DD" and a real date
+    ordinal = date_to_ordinal(value) if isinstance(value, str) else None
+    if ordinal is None or date.fromordinal(ordinal).isoformat() != value:
+        raise ValueError(f"{name} must be a date YYYY-MM-DD, got {value!r}")
+    return value
+
+
+def clean_time(value, name):
+    # "HH:MM" (24h)
+    if not isinstance(value, str) or len(value) != 5 \
+            or time_to_minutes(value) is None:
+        raise ValueError(f"{name} must be a time HH:MM, got {value!r}")
+    return value
+
+
+def clean_amount(value):
+    # positive, finite number (numeric text is converted)
+    if isinstance(value, bool):
+        raise ValueError(f"amount must be a number, got {value!r}")
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"amount must be a number, got {value!r}")
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError(f"amount must be a positive number, got {value!r}")
+    return amount
+
+
+def clean_age(value):
+    if isinstance(value, bool):
+        raise ValueError(f"age must be a whole number, got {value!r}")
+    try:
+        age = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"age must be a whole number, got {value!r}")
+    if age != value and str(age) != str(value).strip():
+        raise ValueError(f"age must be a whole number, got {value!r}")
+    if not 10 <= age <= 100:
+        raise ValueError(f"age must be between 10 and 100, got {age}")
+    return age
+
+
+def check_fields(data, allowed):
+    if not isinstance(data, dict):
+        raise ValueError("expected an object with fields")
+    unknown = [key for key in data if key not in allowed]
+    if unknown:
+        raise ValueError(f"unknown field(s) {', '.join(map(str, unknown))}")
+
+
+def clean_member_data(data, partial=False):
+    # all new-member fields, or (partial=True, for update_member) only the
+    # ones given; None values are left out like update_member does
+    allowed = MEMBER_TEXT_FIELDS + MEMBER_DATE_TEXT_FIELDS + ("age",)
+    if partial:
+        allowed += ("status",)
+    check_fields(data, allowed)
+    cleaned = {}
+    for key in allowed:
+        value = data.get(key)
+        if value is None:
+            if partial or key == "status":
                 continue
-    new_num = max_num + 1
-    return f"{prefix}{new_num:03d}"
+            raise ValueError(f"{key} is missing")
+        if key == "age":
+            cleaned[key] = clean_age(value)
+        elif key in MEMBER_DATE_TEXT_FIELDS:
+            cleaned[key] = clean_date(value, key)
+        elif key == "status":
+            if value not in MEMBER_STATUSES:
+                raise ValueError(f"status must be one of "
+                                 f"{', '.join(MEMBER_STATUSES)}")
+            cleaned[key] = value
+        else:
+            cleaned[key] = clean_text(value, key)
+    return cleaned
+
+
+def clean_payment_data(data):
+    check_fields(data, ("date_paid", "amount", "method", "membership_type"))
+    return {
+        "date_paid": clean_date(data.get("date_paid"), "date_paid"),
+        "amount": clean_amount(data.get("amount")),
+        "method": clean_text(data.get("method"), "method"),
+        "membership_type": clean_text(data.get("membership_type"),
+                                      "membership_type"),
+    }
+
+
+def clean_attendance_data(data):
+    # checkout before checkin is fine (visit went past midnight)
+    check_fields(data, ("date", "checkin", "checkout"))
+    return {
+        "date": clean_date(data.get("date"), "date"),
+        "checkin": clean_time(data.get("checkin"), "checkin"),
+        "checkout": clean_time(data.get("checkout"), "checkout"),
+    }
 
 
 # MEMBER FUNCTIONS 
@@ -36,69 +306,115 @@ def add_member(members, member_data):
         "trainer": member_data["trainer"],
         "schedule": member_data["schedule"],
     }
+    set_date_ordinals(member, MEMBER_DATE_FIELDS)
     members.append(member)
     return member
 
 
 def find_member(members, member_id):
-    # find member by ID
+    # find member by ID (dict lookup when members is a MemberStore)
+    if isinstance(members, MemberStore):
+        return members.find(member_id)
     for m in members:
         if m["member_id"] == member_id:
             return m
     return None
 
 
+def set_member_fields(members, member, fields):
+    # change member fields (keeps MemberStore indexes in sync)
+    fields = dict(fields)
+    for field in MEMBER_DATE_FIELDS:
+        if field in fields:
+            fields[field + "_ord"] = date_to_ordinal(fields[field])
+    if isinstance(members, MemberStore):
+        members.update_fields(member, fields)
+    else:
+        member.update(fields)
+        if isinstance(members, TrackedList):
+            members.mark_changed(member)
+
+
 def update_member(members, member_id, updated_fields):
     # update selected fields of a member
     member = find_member(members, member_id)
     if not member:
         return None
+    changes = {}
     for key, value in updated_fields.items():
         if key in member and value is not None:
-            member[key] = value
+            changes[key] = value
+    set_member_fields(members, member, changes)
     return member
 
 
 def get_active_members(members):
     # filter active members
+    if isinstance(members, MemberStore):
+        return members.with_status("active")
     return [m for m in members if m["status"].lower() == "active"]
 
 
 def get_expired_members(members):
     # filter expired members
+    if isinstance(members, MemberStore):
+        return members.with_status("expired")
     return [m for m in members if m["status"].lower() == "expired"]
 
 
 def get_pending_members(members):
     # members without payment yet
+    if isinstance(members, MemberStore):
+        return members.with_status("pending")
     return [m for m in members if m["status"].lower() == "pending"]
 
 
 def get_members_expiring_within_days(members, days_from_today):
-    # check who is expiring soon (using datetime)
+    # check who is expiring soon (dates parsed at load time)
     result = []
-    today = datetime.today().date()
-    cutoff = today + timedelta(days=days_from_today)
+    today = datetime.today().date().toordinal()
+    cutoff = today + days_from_today
+
+    if isinstance(members, MemberStore):
+        # sorted end date index, soonest first
+        return members.expiring_between(today, cutoff)
 
     for m in members:
-        try:
-            end_date = datetime.strptime(m["end_date"], "%Y-%m-%d").date()
-        except ValueError:
+        end_ord = get_date_ordinal(m, "end_date")
+        if end_ord is None:
             continue
 
-        if today <= end_date <= cutoff:
+        if today <= end_ord <= cutoff:
             result.append(m)
 
     return result
 
 
+def expire_due_memberships(members, today=None):
+    # set status "expired" on every member whose end date has passed
+    # (cancelled members stay expired, nobody is reactivated here);
+    # returns the members changed - the caller saves them in one go
+    if today is None:
+        today = datetime.today().date()
+    today_ord = today.toordinal()
+    if isinstance(members, MemberStore):
+        due = members.pop_due(today_ord)
+    else:
+        due = [m for m in members
+               if m["status"].lower() != "expired"
+               and (get_date_ordinal(m, "end_date") or today_ord) < today_ord]
+    for m in due:
+        set_member_fields(members, m, {"status": "expired"})
+    return due
+
+
 def cancel_membership(members, member_id):
     # set member status to expired
     member = find_member(members, member_id)
     if not member:
         return None
 
-    member["status"] = "expired"
+    set_member_fields(members, member, {"status": "expired"})
     return member
 
 
@@ -119,22 +435,68 @@ def record_payment(members, payments, member_id, payment_data):
         "method": payment_data["method"],
         "membership_type": payment_data["membership_type"],
     }
+    set_date_ordinals(payment, PAYMENT_DATE_FIELDS)
     payments.append(payment)
 
-    # update member status after payment
-    member["status"] = "active"
-    member["membership_type"] = payment_data["membership_type"]
+    # update member status (and the paid-for period) after payment
+    fields = {
+        "status": "active",
+        "membership_type": payment_data["membership_type"],
+    }
+    end_date = paid_until(member, payment)
+    if end_date is not None:
+        fields["end_date"] = end_date
+    set_member_fields(members, member, fields)
 
     return payment, member
 
 
+# days one payment covers, per membership type (unknown types: a month)
+MEMBERSHIP_DAYS = {"Monthly": 30, "Quarterly": 91, "Yearly": 365}
+# a payment this close to the end date (or later) pays for the next period
+RENEWAL_DAYS = 14
+
+
+def paid_until(member, payment):
+    # new end date after a payment, None to keep the current one:
+    # - a pending member's first payment pays for the period entered at
+    #   sign-up (unless that is already over)
+    # - a renewal (paid in the last RENEWAL_DAYS, or after the end date)
+    #   adds the plan's days on from the current end date / payment date
+    # - an earlier payment (e.g. back-filled from the POS) only covers the
+    #   plan's days from its own date, so old payments don't pile up
+    paid_ord = payment.get("date_paid_ord")
+    if paid_ord is None:
+        return None
+    end_ord = get_date_ordinal(member, "end_date")
+    if member["status"].lower() == "pending" and end_ord is not None \
+            and end_ord >= paid_ord:
+        return None
+    days = MEMBERSHIP_DAYS.get(payment["membership_type"], 30)
+    if end_ord is None or paid_ord >= end_ord - RENEWAL_DAYS:
+        new_end = max(end_ord or paid_ord, paid_ord) + days
+    else:
+        new_end = max(end_ord, paid_ord + days)
+    if new_end == end_ord:
+        return None
+    return date.fromordinal(new_end).isoformat()
+
+
 def get_member_payments(payments, member_id):
     # list payments belonging to one member
+    if isinstance(payments, module_sqlite.SqliteTable):
+        return module_sqlite.query_member_payments(payments, member_id)
+    if isinstance(payments, HistoryList):
+        return payments.for_member(member_id)
     return [p for p in payments if p["member_id"] == member_id]
 
 
 def get_payments_in_month(payments, year, month):
     # filter payments by month (YYYY-MM)
+    if isinstance(payments, module_sqlite.SqliteTable):
+        return module_sqlite.query_payments_in_month(payments, year, month)
+    if module_analytics.can_use(payments, "date_paid"):
+        return module_analytics.payments_in_month(payments, year, month)
     filtered = []
     for p in payments:
         parts = p["date_paid"].split("-")
@@ -145,8 +507,28 @@ def get_payments_in_month(payments, year, month):
     return filtered
 
 
+def get_monthly_revenue(payments, year, month):
+    # {(membership_type, method): (count, total)} for year-month
+    # (straight from the rollup when payments is a PaymentList)
+    rollup = getattr(payments, "rollup", None)
+    if rollup is not None:
+        return rollup.month(year, month)
+    breakdown = {}
+    for p in get_payments_in_month(payments, year, month):
+        key = (p["membership_type"], p["method"])
+        count, total = breakdown.get(key, (0, 0.0))
+        breakdown[key] = (count + 1, total + p["amount"])
+    return breakdown
+
+
 def get_revenue_per_membership_type(payments):
     # sum revenue grouped by membership type
+    # (any iterable works, e.g. iter_payments_from_file() in constant memory)
+    rollup = getattr(payments, "rollup", None)
+    if rollup is not None:
+        return dict(rollup.by_type)
+    if module_analytics.can_use(payments, "date_paid"):
+        return module_analytics.revenue_per_membership_type(payments)
     totals = {}
     for p in payments:
         mtype = p["membership_type"]
@@ -166,22 +548,38 @@ def record_attendance(attendance_list, member_id, attendance_data):
         "checkin": attendance_data["checkin"],
         "checkout": attendance_data["checkout"],
     }
+    set_date_ordinals(record, ATTENDANCE_DATE_FIELDS)
     attendance_list.append(record)
     return record
 
 
 def get_member_attendance(attendance_list, member_id):
     # all attendance for one member
+    if isinstance(attendance_list, module_sqlite.SqliteTable):
+        return module_sqlite.query_member_attendance(attendance_list,
+                                                     member_id)
+    if isinstance(attendance_list, HistoryList):
+        return attendance_list.for_member(member_id)
     return [a for a in attendance_list if a["member_id"] == member_id]
 
 
 def get_attendance_on_date(attendance_list, date_str):
     # attendance for specific day
+    if isinstance(attendance_list, module_sqlite.SqliteTable):
+        return module_sqlite.query_attendance_on_date(attendance_list,
+                                                      date_str)
+    if isinstance(attendance_list, AttendanceList):
+        return attendance_list.on_date(date_str)
     return [a for a in attendance_list if a["date"] == date_str]
 
 
 def get_attendance_in_range(attendance_list, start_date, end_date):
     # attendance in date range
+    if isinstance(attendance_list, module_sqlite.SqliteTable):
+        return module_sqlite.query_attendance_in_range(
+            attendance_list, start_date, end_date)
+    if isinstance(attendance_list, AttendanceList):
+        return attendance_list.in_range(start_date, end_date)
     result = []
     for a in attendance_list:
         if start_date <= a["date"] <= end_date:
@@ -191,20 +589,16 @@ def get_attendance_in_range(attendance_list, start_date, end_date):
 
 def get_busiest_day_of_week(attendance_list):
     # find busiest weekday using Counter
-    if not attendance_list:
-        return None, {}
-
+    # (any iterable works, e.g. iter_attendance_from_file() in constant memory)
+    if module_analytics.can_use(attendance_list, "date"):
+        return module_analytics.busiest_day_of_week(attendance_list)
     weekday_counter = Counter()
-    weekday_names = ["Monday", "Tuesday", "Wednesday",
-                     "Thursday", "Friday", "Saturday", "Sunday"]
 
     for a in attendance_list:
-        try:
-            date_obj = datetime.strptime(a["date"], "%Y-%m-%d").date()
-        except ValueError:
+        date_ord = get_date_ordinal(a, "date")
+        if date_ord is None:
             continue
-        weekday_index = date_obj.weekday()
-        weekday_counter[weekday_names[weekday_index]] += 1
+        weekday_counter[WEEKDAY_NAMES[ordinal_weekday(date_ord)]] += 1
 
     if not weekday_counter:
         return None, {}
@@ -213,10 +607,30 @@ def get_busiest_day_of_week(attendance_list):
     return busiest_day, dict(weekday_counter)
 
 
+def get_occupancy(attendance_list):
+    # OccupancyGrid (people per 15 minute slot of the week); an
+    # AttendanceList builds it once and then keeps it up to date
+    if isinstance(attendance_list, AttendanceList):
+        return attendance_list.occupancy_grid()
+    grid = OccupancyGrid()
+    for a in attendance_list:
+        if "date_ord" not in a:
+            a = dict(a, date_ord=get_date_ordinal(a, "date"))
+        grid.add(a)
+    return grid
+
+
 # TRAINER SUMMARY 
 
+# members (not expired) one trainer / one trainer's schedule slot can take
+TRAINER_CAPACITY = 20
+SLOT_CAPACITY = 8
+
+
 def group_members_by_trainer(members):
     # group members by trainer (exclude expired)
+    if isinstance(members, MemberStore):
+        return members.current_trainer_groups()
     trainers = {}
 
     for m in members:
@@ -227,3 +641,28 @@ def group_members_by_trainer(members):
         trainers.setdefault(trainer, []).append(m)
 
     return trainers
+
+
+def get_trainer_load(members):
+    # per trainer: non-expired members vs capacity, and the same for each
+    # of their schedule slots
+    # {trainer: {"count": n, "capacity": c, "slots": {schedule: n},
+    #            "slot_capacity": c}}
+    if isinstance(members, MemberStore):
+        counts = members.current_trainer_counts()
+        slot_counts = members.slot_counts
+    else:
+        counts = {}
+        slot_counts = {}
+        for trainer, group in group_members_by_trainer(members).items():
+            counts[trainer] = len(group)
+            for m in group:
+                slot = (trainer, m["schedule"])
+                slot_counts[slot] = slot_counts.get(slot, 0) + 1
+
+    load = {trainer: {"count": count, "capacity": TRAINER_CAPACITY,
+                      "slots": {}, "slot_capacity": SLOT_CAPACITY}
+            for trainer, count in sorted(counts.items())}
+    for (trainer, schedule), count in sorted(slot_counts.items()):
+        load[trainer]["slots"][schedule] = count
+    return load
@@ -0,0 +1,65 @@
+# compact record types (__slots__ instead of one dict per row)
+from collections.abc import Mapping
+
+
+class Record(Mapping):
+    # works like the old dicts for reading (record["name"], .get, "in",
+    # dict(record)); existing fields can be changed, new keys can't be added
+    __slots__ = ()
+    field_names = ()
+
+    def __init__(self, **values):
+        for key, value in values.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def __getitem__(self, key):
+        if key not in self.field_set:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:  # slot never set (e.g. dates not parsed yet)
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.field_set:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return (key for key in self.field_names if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def update(self, values):
+        for key, value in values.items():
+            self[key] = value
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Member(Record):
+    field_names = ("member_id", "name", "age", "phone", "membership_type",
+                   "start_date", "end_date", "status", "trainer", "schedule",
+                   "start_date_ord", "end_date_ord")
+    field_set = frozenset(field_names)
+    __slots__ = field_names
+
+
+class Payment(Record):
+    field_names = ("payment_id", "member_id", "date_paid", "amount", "method",
+                   "membership_type", "date_paid_ord")
+    field_set = frozenset(field_names)
+    __slots__ = field_names
+
+
+class Attendance(Record):
+    field_names = ("attendance_id", "member_id", "date", "checkin", "checkout",
+                   "date_ord")
+    field_set = frozenset(field_names)
+    __slots__ = field_names
@@ -0,0 +1,232 @@
+# local server: one process owns the data, front desks connect as clients
+#
+# run: python module_server.py [port]
+#
+# protocol: one JSON object per line
+#   request : {"op": "record_payment", "args": {"member_id": "M001", ...}}
+#   response: {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+import asyncio
+import json
+import sys
+
+from module_file import load_all_data, save_changes, compact_journals
+from module_process import (
+    add_member,
+    cancel_membership,
+    clean_attendance_data,
+    clean_member_data,
+    clean_payment_data,
+    expire_due_memberships,
+    find_member,
+    get_attendance_on_date,
+    get_member_attendance,
+    get_member_payments,
+    record_attendance,
+    record_payment,
+    seed_id_allocator,
+    update_member,
+)
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# how often the server looks for memberships past their end date
+EXPIRY_CHECK_SECONDS = 15 * 60
+
+
+def to_plain(value):
+    # records -> plain dicts so they can be sent as JSON
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    return dict(value)
+
+
+class GymServer:
+    # holds members / payments / attendance in memory; reads run straight
+    # away, writes go one at a time through write_lock and are saved
+    # before the reply is sent
+
+    def __init__(self, members, payments, attendance, persist=True):
+        self.members = members
+        self.payments = payments
+        self.attendance = attendance
+        self.persist = persist
+        self.write_lock = asyncio.Lock()
+        self.read_ops = {
+            "ping": lambda: "pong",
+            "find_member": lambda member_id:
+                find_member(self.members, member_id),
+            "member_payments": lambda member_id:
+                get_member_payments(self.payments, member_id),
+            "member_attendance": lambda member_id:
+                get_member_attendance(self.attendance, member_id),
+            "attendance_on_date": lambda date:
+                get_attendance_on_date(self.attendance, date),
+        }
+        self.write_ops = {
+            "add_member": self.add_member,
+            "update_member": self.update_member,
+            "cancel_membership": self.cancel_membership,
+            "record_payment": self.record_payment,
+            "record_attendance": self.record_attendance,
+        }
+
+    # write operations (called with write_lock held); arguments are
+    # checked / converted first, so a bad request changes nothing
+
+    def add_member(self, member_data):
+        return add_member(self.members, clean_member_data(member_data))
+
+    def update_member(self, member_id, fields):
+        fields = clean_member_data(fields, partial=True)
+        member = update_member(self.members, member_id, fields)
+        if member is None:
+            raise ValueError(f"member {member_id} not found")
+        return member
+
+    def cancel_membership(self, member_id):
+        member = cancel_membership(self.members, member_id)
+        if member is None:
+            raise ValueError(f"member {member_id} not found")
+        return member
+
+    def record_payment(self, member_id, payment_data):
+        payment_data = clean_payment_data(payment_data)
+        payment, member = record_payment(self.members, self.payments,
+                                         member_id, payment_data)
+        if payment is None:
+            raise ValueError(f"member {member_id} not found")
+        return payment
+
+    def record_attendance(self, member_id, attendance_data):
+        attendance_data = clean_attendance_data(attendance_data)
+        if find_member(self.members, member_id) is None:
+            raise ValueError(f"member {member_id} not found")
+        return record_attendance(self.attendance, member_id, attendance_data)
+
+    async def save(self):
+        # file I/O in a worker thread so reads keep being answered
+        if self.persist:
+            await asyncio.get_running_loop().run_in_executor(
+                None, save_changes, self.members, self.payments,
+                self.attendance)
+
+    async def expire_due(self):
+        # status engine run: expire what's due, one save for all of them
+        async with self.write_lock:
+            expired = expire_due_memberships(self.members)
+            if expired:
+                await self.save()
+        return expired
+
+    async def expiry_timer(self, seconds=EXPIRY_CHECK_SECONDS):
+        # runs until cancelled (see serve)
+        while True:
+            await asyncio.sleep(seconds)
+            await self.expire_due()
+
+    async def handle_request(self, request):
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+        op = request.get("op")
+        args = request.get("args") or {}
+        if not isinstance(args, dict):
+            return {"ok": False, "error": "args must be a JSON object"}
+        try:
+            if op in self.read_ops:
+                result = self.read_ops[op](**args)
+            elif op in self.write_ops:
+                async with self.write_lock:
+                    result = self.write_ops[op](**args)
+                    try:
+                        await self.save()
+                    except OSError as e:
+                        # change stays in memory and dirty, the next
+                        # save writes it
+                        return {"ok": False,
+                                "error": f"applied but not saved yet: {e}"}
+            else:
+                return {"ok": False, "error": f"unknown op {op!r}"}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": True, "result": to_plain(result)}
+
+    async def handle_client(self, reader, writer):
+        # one connection = one front desk terminal
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    response = {"ok": False, "error": "bad JSON"}
+                else:
+                    response = await self.handle_request(request)
+                writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=HOST, port=PORT):
+        return await asyncio.start_server(self.handle_client, host, port)
+
+
+class GymClient:
+    # thin async client, e.g.
+    #   client = await GymClient.connect()
+    #   payment = await client.call("record_payment", member_id="M001", ...)
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, op, **args):
+        request = json.dumps({"op": op, "args": args}) + "\n"
+        self.writer.write(request.encode("utf-8"))
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(host=HOST, port=PORT):
+    members, payments, attendance = load_all_data()
+    seed_id_allocator(members, payments, attendance)
+    gym = GymServer(members, payments, attendance)
+    expired = await gym.expire_due()
+    if expired:
+        print(f"Expired {len(expired)} membership(s) past their end date.")
+    timer = asyncio.create_task(gym.expiry_timer())
+    server = await gym.start(host, port)
+    print(f"Gym server listening on {host}:{port} (Ctrl+C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        timer.cancel()
+        save_changes(members, payments, attendance)
+        compact_journals()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    try:
+        asyncio.run(serve(port=port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
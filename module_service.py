@@ -0,0 +1,119 @@
+# thread-safe service layer around module_process
+# (e.g. for a thread-pool web frontend)
+#
+# one lock per collection; operations that touch two collections always
+# take them in the same order (members -> payments -> attendance) so two
+# threads can never wait on each other forever
+#
+# saving happens while the collection's lock is still held (on purpose):
+# a change is on disk before the caller gets its reply, and no other
+# thread can append rows between dirty_rows() and mark_clean() (those
+# rows would be marked clean without ever being saved). the cost is that
+# writers to one collection wait for each other's fsync
+import threading
+
+from module_file import save_changes
+from module_process import (
+    add_member,
+    cancel_membership,
+    find_member,
+    get_attendance_in_range,
+    get_attendance_on_date,
+    get_member_attendance,
+    get_member_payments,
+    record_attendance,
+    record_payment,
+    seed_id_allocator,
+    update_member,
+)
+
+
+class GymService:
+
+    def __init__(self, members, payments, attendance, persist=True):
+        self.members = members
+        self.payments = payments
+        self.attendance = attendance
+        self.persist = persist
+        self.members_lock = threading.RLock()
+        self.payments_lock = threading.RLock()
+        self.attendance_lock = threading.RLock()
+        # IDs come from the shared allocator (its own lock, no duplicates)
+        seed_id_allocator(members, payments, attendance)
+
+    # MEMBERS
+
+    def add_member(self, member_data):
+        with self.members_lock:
+            member = add_member(self.members, member_data)
+            self.save_members()
+            return member
+
+    def find_member(self, member_id):
+        with self.members_lock:
+            return find_member(self.members, member_id)
+
+    def update_member(self, member_id, updated_fields):
+        with self.members_lock:
+            member = update_member(self.members, member_id, updated_fields)
+            self.save_members()
+            return member
+
+    def cancel_membership(self, member_id):
+        with self.members_lock:
+            member = cancel_membership(self.members, member_id)
+            self.save_members()
+            return member
+
+    # PAYMENTS
+
+    def record_payment(self, member_id, payment_data):
+        # member status and the payment change together
+        with self.members_lock, self.payments_lock:
+            payment, member = record_payment(self.members, self.payments,
+                                             member_id, payment_data)
+            if payment is not None and self.persist:
+                save_changes(self.members, self.payments)
+            return payment, member
+
+    def get_member_payments(self, member_id):
+        with self.payments_lock:
+            return get_member_payments(self.payments, member_id)
+
+    # ATTENDANCE
+
+    def record_attendance(self, member_id, attendance_data):
+        # None if the member doesn't exist
+        with self.members_lock:
+            if find_member(self.members, member_id) is None:
+                return None
+        with self.attendance_lock:
+            record = record_attendance(self.attendance, member_id,
+                                       attendance_data)
+            if self.persist:
+                save_changes(attendance_list=self.attendance)
+            return record
+
+    def get_member_attendance(self, member_id):
+        with self.attendance_lock:
+            return get_member_attendance(self.attendance, member_id)
+
+    def get_attendance_on_date(self, date_str):
+        with self.attendance_lock:
+            return get_attendance_on_date(self.attendance, date_str)
+
+    def get_attendance_in_range(self, start_date, end_date):
+        with self.attendance_lock:
+            return get_attendance_in_range(self.attendance, start_date,
+                                           end_date)
+
+    # SAVING
+
+    def save_members(self):
+        # caller holds members_lock
+        if self.persist:
+            save_changes(self.members)
+
+    def save_all(self):
+        with self.members_lock, self.payments_lock, self.attendance_lock:
+            save_changes(self.members, self.payments, self.attendance)
@@ -0,0 +1,145 @@
+# binary snapshot of one data file (fast cold start)
+#
+# layout (little endian, version 1):
+#   header   magic, version, source size, source mtime_ns, rows, columns
+#   columns  (name string index, kind) per column
+#   strings  count, blob size, count+1 offsets, utf-8 blob
+#   data     one packed array per column:
+#            "s" = uint32 string index, "i" = int64, "f" = float64,
+#            "d" = int64 date ordinal (0 = bad date)
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from itertools import repeat
+
+MAGIC = b"GYMSNAP\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIQQII")
+COLUMN = struct.Struct("<Ic3x")
+STRINGS = struct.Struct("<II")
+
+# array typecodes for each column kind
+ARRAY_TYPES = {"s": "I", "i": "q", "f": "d", "d": "q"}
+
+# columns that aren't strings (everything else is, apart from *_ord dates)
+COLUMN_KINDS = {"age": "i", "amount": "f"}
+
+
+# permissions for newly created files (mkstemp files start out as 0600)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def file_mode_for(path):
+    # mode a file replacing path should get: the old file's mode, or the
+    # usual 0666 minus umask for a new one
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def column_kind(name):
+    if name.endswith("_ord"):
+        return "d"
+    return COLUMN_KINDS.get(name, "s")
+
+
+def write_snapshot(path, rows, column_names, source_signature):
+    # pack rows into a snapshot file (temp file + rename)
+    string_index = {}
+    strings = []
+
+    def intern(text):
+        index = string_index.get(text)
+        if index is None:
+            index = string_index[text] = len(strings)
+            strings.append(text)
+        return index
+
+    kinds = [column_kind(name) for name in column_names]
+    name_indexes = [intern(name) for name in column_names]
+    data = []
+    for name, kind in zip(column_names, kinds):
+        if kind == "s":
+            values = array("I", (intern(r[name]) for r in rows))
+        elif kind == "d":
+            values = array("q", (r[name] or 0 for r in rows))
+        else:
+            values = array(ARRAY_TYPES[kind], (r[name] for r in rows))
+        data.append(values)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+
+    size, mtime_ns = source_signature
+    folder = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".snap")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, size, mtime_ns,
+                                len(rows), len(column_names)))
+            for name_index, kind in zip(name_indexes, kinds):
+                f.write(COLUMN.pack(name_index, kind.encode("ascii")))
+            f.write(STRINGS.pack(len(strings), offsets[-1]))
+            f.write(offsets.tobytes())
+            f.write(b"".join(encoded))
+            for values in data:
+                f.write(values.tobytes())
+        os.chmod(temp_path, file_mode_for(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_snapshot(path, source_signature):
+    # rows from the snapshot, or None if missing / old version / built
+    # from a different version of the source file
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+        return None
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, size, mtime_ns, row_count, column_count = \
+                HEADER.unpack_from(mm, 0)
+            if (magic != MAGIC or version != VERSION
+                    or (size, mtime_ns) != tuple(source_signature)):
+                return None
+            pos = HEADER.size
+            columns = []
+            for _ in range(column_count):
+                name_index, kind = COLUMN.unpack_from(mm, pos)
+                columns.append((name_index, kind.decode("ascii")))
+                pos += COLUMN.size
+
+            string_count, blob_size = STRINGS.unpack_from(mm, pos)
+            pos += STRINGS.size
+            offsets = array("I")
+            offsets.frombytes(mm[pos:pos + 4 * (string_count + 1)])
+            pos += 4 * (string_count + 1)
+            blob = mm[pos:pos + blob_size]
+            pos += blob_size
+            strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+                       for i in range(string_count)]
+
+            names = []
+            values = []
+            for name_index, kind in columns:
+                column = array(ARRAY_TYPES[kind])
+                end = pos + column.itemsize * row_count
+                column.frombytes(mm[pos:end])
+                pos = end
+                names.append(strings[name_index])
+                if kind == "s":
+                    values.append([strings[i] for i in column])
+                elif kind == "d":
+                    values.append([v or None for v in column])
+                else:
+                    values.append(column.tolist())
+
+    return list(map(dict, map(zip, repeat(names), zip(*values))))
@@ -0,0 +1,226 @@
+# sqlite storage backend (stdlib sqlite3)
+import sqlite3
+
+# column order for each table (same order as the .txt files)
+MEMBER_COLUMNS = ["member_id", "name", "age", "phone", "membership_type",
+                  "start_date", "end_date", "status", "trainer", "schedule"]
+PAYMENT_COLUMNS = ["payment_id", "member_id", "date_paid", "amount",
+                   "method", "membership_type"]
+ATTENDANCE_COLUMNS = ["attendance_id", "member_id", "date", "checkin",
+                      "checkout"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    member_id TEXT PRIMARY KEY,
+    name TEXT, age INTEGER, phone TEXT, membership_type TEXT,
+    start_date TEXT, end_date TEXT, status TEXT, trainer TEXT, schedule TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_members_status ON members(status);
+CREATE INDEX IF NOT EXISTS idx_members_trainer ON members(trainer);
+
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    member_id TEXT, date_paid TEXT, amount REAL, method TEXT,
+    membership_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_payments_member ON payments(member_id);
+CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(date_paid);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    attendance_id TEXT PRIMARY KEY,
+    member_id TEXT, date TEXT, checkin TEXT, checkout TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_member ON attendance(member_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date);
+"""
+
+
+# databases whose tables were already created by this process
+SCHEMA_READY = set()
+
+
+def connect(db_path):
+    # open database (tables are created on the first connect only)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    if db_path not in SCHEMA_READY:
+        conn.executescript(SCHEMA)
+        SCHEMA_READY.add(db_path)
+    return conn
+
+
+def select_rows(db_path, sql, params=()):
+    # run a query and return list of dicts
+    conn = connect(db_path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def iter_rows(db_path, sql, params=()):
+    # stream query results one dict at a time
+    conn = connect(db_path)
+    try:
+        for row in conn.execute(sql, params):
+            yield dict(row)
+    finally:
+        conn.close()
+
+
+def write_rows(db_path, table, columns, rows, replace_all=False):
+    # insert or update rows in one transaction
+    # (upsert keeps the rowid, so load order stays the same as the list)
+    placeholders = ",".join("?" for _ in columns)
+    updates = ",".join(f"{c} = excluded.{c}" for c in columns[1:])
+    sql = (f"INSERT INTO {table} ({','.join(columns)}) "
+           f"VALUES ({placeholders}) "
+           f"ON CONFLICT({columns[0]}) DO UPDATE SET {updates}")
+    conn = connect(db_path)
+    try:
+        with conn:
+            if replace_all:
+                conn.execute(f"DELETE FROM {table}")
+            conn.executemany(sql, ([r[c] for c in columns] for r in rows))
+    finally:
+        conn.close()
+
+
+# LOAD / SAVE
+
+def load_members(db_path):
+    return list(iter_members(db_path))
+
+
+def iter_members(db_path):
+    return iter_rows(db_path, "SELECT * FROM members ORDER BY rowid")
+
+
+def save_members(db_path, members, replace_all=True):
+    write_rows(db_path, "members", MEMBER_COLUMNS, members, replace_all)
+
+
+def load_payments(db_path):
+    return list(iter_payments(db_path))
+
+
+def iter_payments(db_path):
+    return iter_rows(db_path, "SELECT * FROM payments ORDER BY rowid")
+
+
+def save_payments(db_path, payments, replace_all=True):
+    write_rows(db_path, "payments", PAYMENT_COLUMNS, payments, replace_all)
+
+
+def load_attendance(db_path):
+    return list(iter_attendance(db_path))
+
+
+def iter_attendance(db_path):
+    return iter_rows(db_path, "SELECT * FROM attendance ORDER BY rowid")
+
+
+def save_attendance(db_path, attendance_list, replace_all=True):
+    write_rows(db_path, "attendance", ATTENDANCE_COLUMNS, attendance_list,
+               replace_all)
+
+
+# TABLES KEPT IN THE DATABASE
+
+def count_rows(db_path, table):
+    conn = connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class SqliteTable:
+    # payments / attendance left in the database instead of loaded:
+    # queries run as indexed SQL and only rows added since the last save
+    # are held in memory (they're added to every result, so they show up
+    # before saving too); add_ordinals(row) fills in the parsed dates
+
+    def __init__(self, db_path, table, add_ordinals):
+        self.db_path = db_path
+        self.table = table
+        self.add_ordinals = add_ordinals
+        self.new_rows = []
+        self.dirty = False
+
+    def append(self, row):
+        self.new_rows.append(row)
+        self.dirty = True
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def dirty_rows(self):
+        return list(self.new_rows)
+
+    def mark_clean(self):
+        self.new_rows = []
+        self.dirty = False
+
+    def __len__(self):
+        return count_rows(self.db_path, self.table) + len(self.new_rows)
+
+    def __iter__(self):
+        # every row in list order: saved ones, then unsaved ones
+        for row in iter_rows(self.db_path,
+                             f"SELECT * FROM {self.table} ORDER BY rowid"):
+            self.add_ordinals(row)
+            yield row
+        yield from list(self.new_rows)
+
+    def select(self, where, params, keep, order="rowid"):
+        # saved rows matching the WHERE clause, then unsaved rows keep() likes
+        rows = select_rows(
+            self.db_path,
+            f"SELECT * FROM {self.table} WHERE {where} ORDER BY {order}",
+            params)
+        for row in rows:
+            self.add_ordinals(row)
+        return rows + [r for r in self.new_rows if keep(r)]
+
+
+# INDEXED QUERIES (on a SqliteTable)
+
+def query_member_payments(payments, member_id):
+    return payments.select("member_id = ?", (member_id,),
+                           lambda p: p["member_id"] == member_id)
+
+
+def query_payments_in_month(payments, year, month):
+    # date_paid is YYYY-MM-DD so a range on the index works
+    prefix = f"{year}-{month}-"
+    return payments.select("date_paid >= ? AND date_paid < ?",
+                           (prefix, prefix + "\uffff"),
+                           lambda p: p["date_paid"].startswith(prefix))
+
+
+def query_member_attendance(attendance_list, member_id):
+    return attendance_list.select("member_id = ?", (member_id,),
+                                  lambda a: a["member_id"] == member_id)
+
+
+def query_attendance_on_date(attendance_list, date_str):
+    return attendance_list.select("date = ?", (date_str,),
+                                  lambda a: a["date"] == date_str)
+
+
+def query_attendance_in_range(attendance_list, start_date, end_date):
+    # sorted by date (stable sort, so list order within a day)
+    rows = attendance_list.select(
+        "date BETWEEN ? AND ?", (start_date, end_date),
+        lambda a: start_date <= a["date"] <= end_date, order="date, rowid")
+    return sorted(rows, key=lambda a: a["date"])
+
+
+if __name__ == "__main__":
+    # one-shot migration: python module_sqlite.py
+    from module_file import migrate_text_to_sqlite, SQLITE_FILE
+    counts = migrate_text_to_sqlite()
+    print(f"Migrated {counts[0]} members, {counts[1]} payments, "
+          f"{counts[2]} attendance records into {SQLITE_FILE}")
@@ -0,0 +1,505 @@
+# in-memory stores with lookup indexes
+import bisect
+import heapq
+
+
+class TrackedList(list):
+    # list that remembers rows added / changed since the last save
+    # (so saving can skip untouched files or append only the dirty rows)
+
+    def __init__(self, rows=()):
+        super().__init__()
+        self.new_rows = []
+        self.changed_rows = {}
+        self.dirty = False
+        self.needs_full_save = False
+        self.columns = None  # module_analytics column cache
+        for row in rows:
+            self.append(row)
+        self.mark_clean()
+
+    def append(self, row):
+        super().append(row)
+        self.new_rows.append(row)
+        self.dirty = True
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __iadd__(self, rows):
+        self.extend(rows)
+        return self
+
+    # the other list changes remove, replace or move rows: the indexes are
+    # rebuilt (O(n), these are rare) and the next save writes the whole
+    # collection, since a journal can only add / update rows
+
+    def rewritten(self):
+        self.needs_full_save = True
+        self.dirty = True
+        self.columns = None
+        self.reindex()
+
+    def reindex(self):
+        # subclasses rebuild their indexes from the rows here
+        pass
+
+    def insert(self, index, row):
+        super().insert(index, row)
+        self.rewritten()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self.rewritten()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.rewritten()
+
+    def __imul__(self, count):
+        super().__imul__(count)
+        self.rewritten()
+        return self
+
+    def remove(self, row):
+        super().remove(row)
+        self.rewritten()
+
+    def pop(self, index=-1):
+        row = super().pop(index)
+        self.rewritten()
+        return row
+
+    def clear(self):
+        super().clear()
+        self.rewritten()
+
+    def sort(self, *, key=None, reverse=False):
+        super().sort(key=key, reverse=reverse)
+        self.rewritten()
+
+    def reverse(self):
+        super().reverse()
+        self.rewritten()
+
+    def mark_changed(self, row):
+        # call after changing a row in place
+        self.changed_rows[id(row)] = row
+        self.dirty = True
+
+    def dirty_rows(self):
+        # new + changed rows, each once
+        rows = {id(row): row for row in self.new_rows}
+        rows.update(self.changed_rows)
+        return list(rows.values())
+
+    def mark_clean(self):
+        self.new_rows = []
+        self.changed_rows = {}
+        self.dirty = False
+        self.needs_full_save = False
+
+
+class ExpiryIndex:
+    # (end_date_ord, member_id) pairs kept sorted by end date,
+    # so "expiring within N days" is a binary search
+
+    def __init__(self, pairs=()):
+        self.pairs = sorted(pairs)
+
+    @classmethod
+    def from_members(cls, members):
+        return cls((m["end_date_ord"], m["member_id"]) for m in members
+                   if m.get("end_date_ord") is not None)
+
+    def add(self, end_ord, member_id):
+        if end_ord is not None:
+            bisect.insort(self.pairs, (end_ord, member_id))
+
+    def remove(self, end_ord, member_id):
+        if end_ord is None:
+            return
+        pos = bisect.bisect_left(self.pairs, (end_ord, member_id))
+        if pos < len(self.pairs) and self.pairs[pos] == (end_ord, member_id):
+            del self.pairs[pos]
+
+    def between(self, first_ord, last_ord):
+        # member IDs with first_ord <= end date <= last_ord
+        lo = bisect.bisect_left(self.pairs, (first_ord,))
+        hi = bisect.bisect_left(self.pairs, (last_ord + 1,))
+        return [member_id for _, member_id in self.pairs[lo:hi]]
+
+
+class MemberStore(TrackedList):
+    # list of member dicts plus dict indexes on id, status, trainer
+    # and end date (still a normal list so old code can loop over it)
+
+    def __init__(self, members=(), expiry=None):
+        self.by_id = {}
+        self.by_status = {}
+        self.by_trainer = {}
+        # trainer load: only members that aren't expired
+        self.current_by_trainer = {}  # trainer -> {id: member}
+        self.slot_counts = {}  # (trainer, schedule) -> member count
+        self.position = {}
+        self.expiry = None  # built in one go below
+        self.due = None
+        super().__init__(members)
+        self.build_end_date_indexes(expiry)
+
+    def build_end_date_indexes(self, expiry=None):
+        # a saved index (see module_file) skips the sort at startup
+        self.expiry = expiry or ExpiryIndex.from_members(self)
+        # (end_date_ord, member_id) heap of members that aren't expired yet
+        self.due = [(m["end_date_ord"], m["member_id"]) for m in self
+                    if m.get("end_date_ord") is not None
+                    and m["status"].lower() != "expired"]
+        heapq.heapify(self.due)
+
+    def reindex(self):
+        self.by_id = {}
+        self.by_status = {}
+        self.by_trainer = {}
+        self.current_by_trainer = {}
+        self.slot_counts = {}
+        self.position = {}
+        self.expiry = None
+        self.due = None
+        for pos, member in enumerate(self):
+            self.position[member["member_id"]] = pos
+            self.index_member(member)
+        self.build_end_date_indexes()
+
+    def append(self, member):
+        self.position[member["member_id"]] = len(self)
+        super().append(member)
+        self.index_member(member)
+
+    def index_member(self, member, push_due=True):
+        # add member to all indexes (push_due=False: its entry in the due
+        # heap is still right, see update_fields)
+        member_id = member["member_id"]
+        self.by_id[member_id] = member
+        self.by_status.setdefault(member["status"].lower(), {})[member_id] = member
+        self.by_trainer.setdefault(member["trainer"], {})[member_id] = member
+        if member["status"].lower() != "expired":
+            trainer = member["trainer"]
+            self.current_by_trainer.setdefault(trainer, {})[member_id] = member
+            slot = (trainer, member["schedule"])
+            self.slot_counts[slot] = self.slot_counts.get(slot, 0) + 1
+        if self.expiry is not None:
+            self.expiry.add(member.get("end_date_ord"), member_id)
+        if (push_due and self.due is not None
+                and member.get("end_date_ord") is not None
+                and member["status"].lower() != "expired"):
+            # old entries for this member are skipped in pop_due
+            heapq.heappush(self.due, (member["end_date_ord"], member_id))
+
+    def unindex_member(self, member):
+        # remove member from the secondary indexes
+        member_id = member["member_id"]
+        status_bucket = self.by_status.get(member["status"].lower(), {})
+        status_bucket.pop(member_id, None)
+        trainer_bucket = self.by_trainer.get(member["trainer"], {})
+        trainer_bucket.pop(member_id, None)
+        current = self.current_by_trainer.get(member["trainer"], {})
+        if current.pop(member_id, None) is not None:
+            if not current:
+                del self.current_by_trainer[member["trainer"]]
+            slot = (member["trainer"], member["schedule"])
+            self.slot_counts[slot] -= 1
+            if not self.slot_counts[slot]:
+                del self.slot_counts[slot]
+        if self.expiry is not None:
+            self.expiry.remove(member.get("end_date_ord"), member_id)
+
+    def find(self, member_id):
+        # O(1) lookup by ID
+        return self.by_id.get(member_id)
+
+    def update_fields(self, member, fields):
+        # change fields and keep the indexes in sync; the due heap only
+        # needs a new entry if the end date changed or the member stopped
+        # being expired (otherwise it would grow with every edit)
+        old_end = member.get("end_date_ord")
+        was_expired = member["status"].lower() == "expired"
+        self.unindex_member(member)
+        for key, value in fields.items():
+            member[key] = value
+        self.index_member(member, push_due=(
+            member.get("end_date_ord") != old_end or was_expired))
+        self.mark_changed(member)
+
+    def in_list_order(self, bucket):
+        # keep the same order as the original list
+        return sorted(bucket.values(), key=lambda m: self.position[m["member_id"]])
+
+    def with_status(self, status):
+        # members with given status (case-insensitive)
+        return self.in_list_order(self.by_status.get(status.lower(), {}))
+
+    def with_trainer(self, trainer):
+        # members assigned to a trainer
+        return self.in_list_order(self.by_trainer.get(trainer, {}))
+
+    def pop_due(self, today_ord):
+        # non-expired members whose end date is before today_ord, taken off
+        # the heap (O(k log n)); stale entries left behind by updates are
+        # dropped on the way
+        due = []
+        seen = set()
+        while self.due and self.due[0][0] < today_ord:
+            end_ord, member_id = heapq.heappop(self.due)
+            member = self.by_id.get(member_id)
+            if (member is None or member_id in seen
+                    or member["status"].lower() == "expired"
+                    or member.get("end_date_ord") != end_ord):
+                continue
+            seen.add(member_id)
+            due.append(member)
+        return due
+
+    def current_trainer_groups(self):
+        # {trainer: non-expired members}, trainers in order of their first
+        # member in the list (same as grouping with a loop over the list)
+        groups = [self.in_list_order(bucket)
+                  for bucket in self.current_by_trainer.values()]
+        groups.sort(key=lambda g: self.position[g[0]["member_id"]])
+        return {g[0]["trainer"]: g for g in groups}
+
+    def current_trainer_counts(self):
+        # {trainer: number of non-expired members}
+        return {trainer: len(bucket)
+                for trainer, bucket in self.current_by_trainer.items()}
+
+    def expiring_between(self, first_ord, last_ord):
+        # members whose end date is in the range, soonest first
+        return [self.by_id[member_id]
+                for member_id in self.expiry.between(first_ord, last_ord)
+                if member_id in self.by_id]
+
+
+class HistoryList(TrackedList):
+    # payment / attendance records plus a member_id -> records index,
+    # so one member's history costs only as much as that history
+
+    def __init__(self, records=()):
+        self.by_member = {}
+        super().__init__(records)
+
+    def append(self, record):
+        super().append(record)
+        self.by_member.setdefault(record["member_id"], []).append(record)
+
+    def reindex(self):
+        self.by_member = {}
+        for record in self:
+            self.by_member.setdefault(record["member_id"], []).append(record)
+
+    def for_member(self, member_id):
+        return list(self.by_member.get(member_id, []))
+
+
+class RevenueRollup:
+    # payment count + total amount per (year, month, membership_type,
+    # method), kept up to date as payments are added, so monthly and
+    # per-type revenue don't need a pass over every payment
+
+    def __init__(self, cells=()):
+        self.cells = {}     # (year, month, type, method) -> [count, total]
+        self.by_month = {}  # (year, month) -> {(type, method): cell}
+        self.by_type = {}   # type -> total amount
+        self.count = 0      # payments counted (to spot a stale saved rollup)
+        for key, count, total in cells:
+            self.add_to_cell(key, count, total)
+
+    @classmethod
+    def from_payments(cls, payments):
+        rollup = cls()
+        for p in payments:
+            rollup.add(p)
+        return rollup
+
+    def add_to_cell(self, key, count, total):
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = [0, 0.0]
+            year, month, mtype, method = key
+            self.by_month.setdefault((year, month), {})[(mtype, method)] = cell
+        cell[0] += count
+        cell[1] += total
+        self.by_type[key[2]] = self.by_type.get(key[2], 0.0) + total
+        self.count += count
+
+    def add(self, payment):
+        # payments with a bad date still count towards their type
+        parts = payment["date_paid"].split("-")
+        year, month = (parts[0], parts[1]) if len(parts) == 3 else ("", "")
+        self.add_to_cell((year, month, payment["membership_type"],
+                          payment["method"]), 1, payment["amount"])
+
+    def month(self, year, month):
+        # {(membership_type, method): (count, total)} for year-month
+        cells = self.by_month.get((year, month), {})
+        return {key: (cell[0], cell[1]) for key, cell in cells.items()}
+
+
+class PaymentList(HistoryList):
+    # payments (indexed by member) plus the revenue rollup
+
+    def __init__(self, records=(), rollup=None):
+        self.rollup = None  # built in one go below
+        super().__init__(records)
+        # a saved rollup (see module_file) skips the pass at startup
+        if rollup is None or rollup.count != len(self):
+            rollup = RevenueRollup.from_payments(self)
+        self.rollup = rollup
+
+    def append(self, record):
+        super().append(record)
+        if self.rollup is not None:
+            self.rollup.add(record)
+
+    def reindex(self):
+        super().reindex()
+        self.rollup = RevenueRollup.from_payments(self)
+
+
+# occupancy slots: 15 minutes, 96 per day, 672 per week (Monday 00:00 = 0)
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+
+
+def time_to_minutes(text):
+    # "HH:MM" -> minutes after midnight, None if not a valid time
+    hours, sep, minutes = text.partition(":")
+    if not (sep and hours.isdigit() and minutes.isdigit()):
+        return None
+    hours, minutes = int(hours), int(minutes)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+class OccupancyGrid:
+    # people in the gym per 15 minute slot of the week, summed over all
+    # visits; each visit is two +1/-1 marks in a difference array and one
+    # prefix-sum pass turns that into the counts
+    #
+    # a visit covers every slot it overlaps; checkout before checkin means
+    # it went past midnight (Sunday night carries on into Monday); visits
+    # with a bad date / time or no length at all are counted in skipped
+
+    def __init__(self, records=()):
+        self.diff = [0] * (WEEK_SLOTS + 1)
+        self.days_seen = [set() for _ in range(7)]
+        self.visits = 0
+        self.skipped = 0
+        self.counts = None  # prefix sums, redone after new visits
+        self.parsed_times = {}  # "HH:MM" -> minutes (only 1440 real ones)
+        for record in records:
+            self.add(record)
+
+    def minutes(self, text):
+        try:
+            return self.parsed_times[text]
+        except KeyError:
+            value = self.parsed_times[text] = time_to_minutes(text)
+            return value
+
+    def add(self, record):
+        date_ord = record.get("date_ord")
+        checkin = self.minutes(record["checkin"])
+        checkout = self.minutes(record["checkout"])
+        if date_ord is None or checkin is None or checkout is None \
+                or checkin == checkout:
+            self.skipped += 1
+            return
+        if checkout < checkin:
+            checkout += 24 * 60  # overnight
+        weekday = (date_ord - 1) % 7
+        first = weekday * SLOTS_PER_DAY + checkin // SLOT_MINUTES
+        last = weekday * SLOTS_PER_DAY + (checkout - 1) // SLOT_MINUTES + 1
+        if last <= WEEK_SLOTS:
+            self.diff[first] += 1
+            self.diff[last] -= 1
+        else:  # wraps round the end of the week
+            self.diff[first] += 1
+            self.diff[WEEK_SLOTS] -= 1
+            self.diff[0] += 1
+            self.diff[last - WEEK_SLOTS] -= 1
+        self.days_seen[weekday].add(date_ord)
+        self.visits += 1
+        self.counts = None
+
+    def slot_counts(self):
+        # total people per slot of the week (WEEK_SLOTS numbers)
+        if self.counts is None:
+            counts = []
+            running = 0
+            for step in self.diff[:WEEK_SLOTS]:
+                running += step
+                counts.append(running)
+            self.counts = counts
+        return self.counts
+
+    def averages(self):
+        # [weekday][slot] -> average people present on that weekday
+        counts = self.slot_counts()
+        table = []
+        for weekday in range(7):
+            days = len(self.days_seen[weekday]) or 1
+            start = weekday * SLOTS_PER_DAY
+            table.append([c / days
+                          for c in counts[start:start + SLOTS_PER_DAY]])
+        return table
+
+
+class AttendanceList(HistoryList):
+    # attendance records plus a copy kept sorted by date,
+    # so day / range queries are a binary search (O(log n + k))
+
+    def __init__(self, records=()):
+        self.dates = None  # built with one sort after loading
+        self.occupancy = None  # built the first time someone asks
+        super().__init__(records)
+        self.rebuild_date_index()
+
+    def append(self, record):
+        super().append(record)
+        if self.dates is not None:
+            self.index_date(record)
+        if self.occupancy is not None:
+            self.occupancy.add(record)
+
+    def reindex(self):
+        super().reindex()
+        self.rebuild_date_index()
+        self.occupancy = None
+
+    def occupancy_grid(self):
+        if self.occupancy is None:
+            self.occupancy = OccupancyGrid(self)
+        return self.occupancy
+
+    def rebuild_date_index(self):
+        # stable sort keeps list order for records on the same day
+        self.by_date = sorted(self, key=lambda r: r["date"])
+        self.dates = [r["date"] for r in self.by_date]
+
+    def index_date(self, record):
+        # insert in date order (cheap when check-ins arrive in order)
+        pos = bisect.bisect_right(self.dates, record["date"])
+        self.dates.insert(pos, record["date"])
+        self.by_date.insert(pos, record)
+
+    def in_range(self, start_date, end_date):
+        # records with start_date <= date <= end_date, sorted by date
+        lo = bisect.bisect_left(self.dates, start_date)
+        hi = bisect.bisect_right(self.dates, end_date)
+        return self.by_date[lo:hi]
+
+    def on_date(self, date_str):
+        return self.in_range(date_str, date_str)